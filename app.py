@@ -1,18 +1,28 @@
 import numpy as np
 import json
 import time
-from datetime import datetime
-import uuid
 
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, Response, render_template, request, jsonify, send_file, stream_with_context
 
-from config import UPLOAD_FOLDER, RESULT_FOLDER, MAX_CONTENT_LENGTH
+from config import (UPLOAD_FOLDER, RESULT_FOLDER, MAX_CONTENT_LENGTH, LAZY_RESULT_RENDERING,
+                    BURST_GROUPING_ENABLED, RETENTION_SWEEP_INTERVAL, PROFILING_ENABLED, IMAGE_EXTENSIONS)
 
 from models.detector import detect_bears
 from utils.visualization import draw_colored_box, add_info_panel
-from utils.history_manager import load_history, save_history, calculate_summary_statistics
-from utils.excel_reporter import generate_excel_report, generate_json_report, generate_pdf_report
-from utils.file_handler import save_uploaded_file, save_result_image
+from utils.history_manager import (load_history, append_history, build_history_entry,
+                                  iter_history_ndjson, iter_history_json_array)
+from utils.excel_reporter import generate_excel_report, generate_json_report, generate_pdf_report, generate_parquet_report
+from utils.pdf_report import generate_full_pdf_report
+from utils.history_table import load_history_frames, summarize_frames
+from utils.event_stream import broadcaster, iter_events
+from utils.retention import start_retention_worker
+from utils.profiler import profiled, list_profiles
+from utils.stream_upload import (UploadError, save_stream, start_chunked_upload, chunked_upload_status,
+                                 append_chunk)
+from utils.file_handler import save_uploaded_file, save_result_image, result_name
+from utils.result_renderer import get_cached_result, cached_result_url
+from utils.burst_grouping import burst_index, frame_signature, burst_fields, new_burst_id
+from utils.image_loader import load_image
 
 
 class NumpyEncoder(json.JSONEncoder):
@@ -34,13 +44,96 @@ app.config['RESULT_FOLDER'] = RESULT_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = MAX_CONTENT_LENGTH
 app.json_encoder = NumpyEncoder
 
+if RETENTION_SWEEP_INTERVAL > 0:
+    start_retention_worker(RETENTION_SWEEP_INTERVAL)
+
 
 @app.route('/')
 def index():
     return render_template('index.html')
 
 
+def process_upload(filename, upload_path, start_time, lazy_render=LAZY_RESULT_RENDERING, source=None):
+    # Серии группируются только для явно указанного источника (камеры):
+    # по IP клиента разные сцены одной камеры могли бы ошибочно склеиться
+    grouping = BURST_GROUPING_ENABLED and bool(source)
+    burst = None
+    if grouping:
+        phash, captured_at = frame_signature(upload_path, fallback_to_now=True)
+        burst = burst_index.find(source, phash, captured_at)
+
+    if burst is not None:
+        # Кадр из той же серии — повторно используем детекции первого кадра
+        detections = burst['detections']
+        result_img = None if lazy_render else load_image(upload_path)[0]
+    else:
+        detections, result_img = detect_bears(
+            upload_path,
+            confidence_threshold=0.25,
+            return_image=not lazy_render
+        )
+
+    if lazy_render:
+        processing_time = time.time() - start_time
+        result_filename = result_name(filename)
+        result_url = cached_result_url(result_filename)
+    else:
+        for detection in detections:
+            result_img = draw_colored_box(result_img, detection)
+
+        processing_time = time.time() - start_time
+
+        result_img = add_info_panel(result_img, detections, processing_time)
+
+        result_filename, result_path = save_result_image(result_img, filename)
+        result_url = f'static/results/{result_filename}'
+
+    history_entry = build_history_entry(filename, detections, processing_time, result_url, lazy_render)
+    if grouping:
+        history_entry.update(burst_fields(
+            source,
+            phash,
+            captured_at,
+            burst['burst_id'] if burst is not None else new_burst_id(),
+            burst is None
+        ))
+    versions = append_history([history_entry])
+    if grouping:
+        burst_index.add(history_entry)
+    broadcaster.publish(history_entry, versions)
+
+    response_detections = []
+    for det in detections:
+        response_detections.append({
+            'bbox': [float(x) for x in det['bbox']],
+            'confidence': float(det['confidence']),
+            'class': det['class'],
+            'class_id': int(det['class_id'])
+        })
+
+    return {
+        'success': True,
+        'bear_count': int(len(detections)),
+        'detections': response_detections,
+        'result_image': result_url,
+        'history_id': history_entry['id'],
+        'burst_id': history_entry.get('burst_id'),
+        'processing_time': float(processing_time)
+    }
+
+
+def request_render_mode(values):
+    # Режим отрисовки можно переопределить для отдельного запроса
+    render_mode = values.get('render', '').lower()
+    if render_mode == 'lazy':
+        return True
+    elif render_mode == 'eager':
+        return False
+    return LAZY_RESULT_RENDERING
+
+
 @app.route('/upload', methods=['POST'])
+@profiled('upload')
 def upload_image():
     if 'image' not in request.files:
         return jsonify({'error': 'No image uploaded'}), 400
@@ -49,64 +142,77 @@ def upload_image():
     if file.filename == '':
         return jsonify({'error': 'No selected file'}), 400
 
+    lazy_render = request_render_mode(request.form)
+
     start_time = time.time()
 
     filename, upload_path = save_uploaded_file(file)
 
-    detections, result_img = detect_bears(upload_path, confidence_threshold=0.25)
+    # Источник (камера) для группировки серий снимков
+    source = request.form.get('source')
 
-    for detection in detections:
-        result_img = draw_colored_box(result_img, detection)
+    return jsonify(process_upload(filename, upload_path, start_time, lazy_render, source))
 
-    processing_time = time.time() - start_time
 
-    result_img = add_info_panel(result_img, detections, processing_time)
+def finish_stream_upload(upload, start_time):
+    # Файл уже лежит в папке загрузок и передается детектору на месте
+    if not upload['filename'].lower().endswith(IMAGE_EXTENSIONS):
+        return jsonify({
+            'success': True,
+            'file': f"static/uploads/{upload['filename']}",
+            'size': upload['size'],
+            'sha256': upload['sha256'],
+            'detection': 'skipped'
+        })
 
-    result_filename, result_path = save_result_image(result_img, filename)
+    source = request.args.get('source')
+    result = process_upload(upload['filename'], upload['path'], start_time, request_render_mode(request.args), source)
+    result.update({'size': upload['size'], 'sha256': upload['sha256']})
+    return jsonify(result)
 
-    detailed_detections = []
-    for det in detections:
-        detailed_detections.append({
-            'bbox': [float(x) for x in det['bbox']],
-            'confidence': float(det['confidence']),
-            'class': det['class'],
-            'class_id': int(det['class_id']),
-            'area': float(det.get('area', 0)),
-            'center_x': float(det.get('center_x', 0)),
-            'center_y': float(det.get('center_y', 0))
-        })
 
-    history_entry = {
-        'id': str(uuid.uuid4()),
-        'timestamp': datetime.now().isoformat(),
-        'original_image': f'static/uploads/{filename}',
-        'result_image': f'static/results/{result_filename}',
-        'detections': detailed_detections,
-        'bear_count': int(len(detections)),
-        'processing_time': float(processing_time)
-    }
+@app.errorhandler(UploadError)
+def handle_upload_error(e):
+    return jsonify({'error': str(e), **e.extra}), e.status
 
-    history = load_history()
-    history.append(history_entry)
-    save_history(history)
 
-    response_detections = []
-    for det in detections:
-        response_detections.append({
-            'bbox': [float(x) for x in det['bbox']],
-            'confidence': float(det['confidence']),
-            'class': det['class'],
-            'class_id': int(det['class_id'])
-        })
+@app.route('/upload/stream', methods=['POST', 'PUT'])
+def upload_stream():
+    filename = request.args.get('filename', '')
+    if not filename:
+        return jsonify({'error': 'No filename'}), 400
 
-    return jsonify({
-        'success': True,
-        'bear_count': int(len(detections)),
-        'detections': response_detections,
-        'result_image': f'static/results/{result_filename}',
-        'history_id': history_entry['id'],
-        'processing_time': float(processing_time)
-    })
+    start_time = time.time()
+    upload = save_stream(request.environ, filename)
+    return finish_stream_upload(upload, start_time)
+
+
+@app.route('/upload/chunked', methods=['POST'])
+def start_chunked():
+    data = request.get_json(silent=True) or {}
+    return jsonify(start_chunked_upload(data.get('filename', ''), data.get('size')))
+
+
+@app.route('/upload/chunked/<upload_id>', methods=['GET'])
+def chunked_status(upload_id):
+    return jsonify(chunked_upload_status(upload_id))
+
+
+@app.route('/upload/chunked/<upload_id>', methods=['PUT'])
+def upload_chunk(upload_id):
+    start_time = time.time()
+    upload = append_chunk(upload_id, request.environ, request.headers.get('Content-Range'))
+    if not upload['complete']:
+        return jsonify(upload)
+    return finish_stream_upload(upload, start_time)
+
+
+@app.route('/static/results/cache/<filename>')
+def get_cached_result_image(filename):
+    result_path = get_cached_result(filename)
+    if result_path is None:
+        return jsonify({'error': 'Result not found'}), 404
+    return send_file(result_path)
 
 
 @app.route('/history')
@@ -115,14 +221,71 @@ def get_history():
     return jsonify(history)
 
 
+def stream_history_response(stream_format, download_name=None):
+    if stream_format == 'ndjson':
+        body, mimetype = iter_history_ndjson(), 'application/x-ndjson'
+    elif stream_format == 'json':
+        body, mimetype = iter_history_json_array(), 'application/json'
+    else:
+        return jsonify({'error': 'Unsupported format'}), 400
+
+    headers = {}
+    if download_name:
+        headers['Content-Disposition'] = f'attachment; filename={download_name}'
+
+    return Response(stream_with_context(body), mimetype=mimetype, headers=headers)
+
+
+@app.route('/history/stream')
+def stream_history():
+    return stream_history_response(request.args.get('format', 'ndjson').lower())
+
+
 @app.route('/generate-report')
+@profiled('report')
 def generate_report():
+    report_format = request.args.get('format', 'excel').lower()
+
+    # Потоковая выгрузка без промежуточного файла и списка в памяти
+    if report_format == 'ndjson':
+        return stream_history_response('ndjson', 'bear_report.ndjson')
+    if report_format == 'json' and request.args.get('stream') == '1':
+        return stream_history_response('json', 'bear_report.json')
+
+    if report_format == 'pdf' and request.args.get('full') == '1':
+        requests_df, detections_df = load_history_frames()
+        if requests_df.empty:
+            return jsonify({'error': 'History is empty'}), 400
+        try:
+            path = generate_full_pdf_report(requests_df=requests_df, detections_df=detections_df)
+        except Exception as e:
+            return jsonify({'error': f'Failed to generate report: {str(e)}'}), 500
+        return send_file(
+            path,
+            as_attachment=True,
+            download_name='bear_report_full.pdf',
+            mimetype='application/pdf'
+        )
+
+    if report_format == 'parquet':
+        requests_df, detections_df = load_history_frames()
+        if requests_df.empty:
+            return jsonify({'error': 'History is empty'}), 400
+        try:
+            path = generate_parquet_report(requests_df, detections_df)
+        except Exception as e:
+            return jsonify({'error': f'Failed to generate report: {str(e)}'}), 500
+        return send_file(
+            path,
+            as_attachment=True,
+            download_name='bear_report_parquet.zip',
+            mimetype='application/zip'
+        )
+
     history = load_history()
     if not history:
         return jsonify({'error': 'History is empty'}), 400
 
-    report_format = request.args.get('format', 'excel').lower()
-
     try:
         if report_format == 'excel':
             path = generate_excel_report(history)
@@ -159,19 +322,30 @@ def generate_report():
 
 
 
+@app.route('/profiles')
+def get_profiles():
+    if not PROFILING_ENABLED:
+        return jsonify({'error': 'Profiling is disabled'}), 404
+
+    limit = request.args.get('limit', 20, type=int)
+    return jsonify(list_profiles(limit))
+
+
 @app.route('/stats')
 def get_statistics():
-    history = load_history()
+    requests_df, detections_df = load_history_frames()
 
-    if not history:
+    if requests_df.empty:
         return jsonify({
             'total_requests': 0,
             'total_bears': 0,
             'avg_confidence': 0,
+            'total_events': 0,
+            'event_bears': 0,
             'daily_stats': []
         })
 
-    summary = calculate_summary_statistics(history)
+    summary = summarize_frames(requests_df, detections_df)
 
     return jsonify({
         'total_requests': summary['total_requests'],
@@ -180,48 +354,35 @@ def get_statistics():
         'max_confidence': summary['max_confidence'],
         'min_confidence': summary['min_confidence'],
         'bears_per_request': summary['bears_per_request'],
+        'total_events': summary['total_events'],
+        'event_bears': summary['event_bears'],
         'daily_stats': summary['daily_stats']
     })
 
 
 @app.route('/quick-stats')
 def get_quick_stats():
-    history = load_history()
-
-    if not history:
-        return jsonify({
-            'total': 0,
-            'bears_total': 0,
-            'today': 0,
-            'avg_confidence': 0
-        })
-
-    today = datetime.now().strftime("%Y-%m-%d")
-    today_requests = 0
-    today_bears = 0
-
-    for item in history:
-        if item['timestamp'].startswith(today):
-            today_requests += 1
-            today_bears += item['bear_count']
-
-    total_requests = len(history)
-    total_bears = sum(item['bear_count'] for item in history)
-
-    all_confidences = []
-    for item in history:
-        for det in item['detections']:
-            all_confidences.append(det['confidence'])
-
-    avg_confidence = np.mean(all_confidences) if all_confidences else 0
-
-    return jsonify({
-        'total': total_requests,
-        'bears_total': total_bears,
-        'today': today_requests,
-        'today_bears': today_bears,
-        'avg_confidence': avg_confidence
-    })
+    return jsonify(broadcaster.snapshot())
+
+
+@app.route('/events')
+def stream_events():
+    subscriber = broadcaster.subscribe()
+    if subscriber is None:
+        # Клиент переходит на периодический опрос /stats
+        return jsonify({'error': 'Too many event subscribers'}), 503
+
+    def stream():
+        try:
+            yield from iter_events(subscriber)
+        finally:
+            broadcaster.unsubscribe(subscriber)
+
+    return Response(
+        stream_with_context(stream()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
 
 
 if __name__ == '__main__':
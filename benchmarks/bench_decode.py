@@ -0,0 +1,84 @@
+"""Время декодирования и пиковая память: полное декодирование vs DCT-масштабирование.
+
+Каждое измерение выполняется в отдельном процессе, пиковая память — ru_maxrss
+дочернего процесса. Тестовые JPEG генерируются во временной папке.
+
+Пример:
+    python benchmarks/bench_decode.py --sizes 2 8 12 20 24 --runs 5
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from PIL import Image
+
+from config import MODEL_INPUT_SIZE
+from utils.image_loader import load_image
+
+
+def make_jpeg(path, megapixels):
+    width = int((megapixels * 1e6 * 4 / 3) ** 0.5)
+    height = int(width * 3 / 4)
+    # Градиент с шумом, чтобы JPEG не сжимался до тривиального размера
+    gradient = np.linspace(0, 255, width, dtype=np.float32)[None, :, None]
+    noise = np.random.default_rng(0).integers(0, 64, (height, width, 3), dtype=np.uint8)
+    image = (np.broadcast_to(gradient, (height, width, 3)) * 0.75 + noise).astype(np.uint8)
+    Image.fromarray(image).save(path, quality=90)
+    return width, height
+
+
+def run_child(mode, path, runs):
+    target_size = MODEL_INPUT_SIZE if mode == 'reduced' else None
+    timings = []
+    for _ in range(runs):
+        start_time = time.perf_counter()
+        image_np, _ = load_image(path, target_size)
+        timings.append(time.perf_counter() - start_time)
+        del image_np
+
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"{min(timings)} {peak_kb}")
+
+
+def measure(mode, path, runs):
+    output = subprocess.check_output(
+        [sys.executable, os.path.abspath(__file__), '--child', mode, path, '--runs', str(runs)],
+        text=True
+    )
+    best, peak_kb = output.split()
+    return float(best), int(peak_kb) / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=float, nargs='+', default=[2, 8, 12, 20, 24], help="Мегапиксели")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--child', nargs=2, metavar=('MODE', 'PATH'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child[0], args.child[1], args.runs)
+        return
+
+    print(f"{'МП':>5} {'размер':>12} {'full, мс':>10} {'reduced, мс':>12} {'full, МБ':>10} {'reduced, МБ':>12}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for megapixels in args.sizes:
+            path = os.path.join(tmp_dir, f'{megapixels}mp.jpg')
+            width, height = make_jpeg(path, megapixels)
+
+            full_time, full_mem = measure('full', path, args.runs)
+            reduced_time, reduced_mem = measure('reduced', path, args.runs)
+
+            print(f"{megapixels:>5.0f} {f'{width}x{height}':>12} {full_time * 1000:>10.1f} "
+                  f"{reduced_time * 1000:>12.1f} {full_mem:>10.1f} {reduced_mem:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
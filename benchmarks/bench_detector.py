@@ -0,0 +1,51 @@
+"""Замер detect_bears на пустых кадрах и кадрах с медведем.
+
+"До" — старое поведение: NMS по всем 80 классам COCO и result.plot() на пустых кадрах.
+"После" — фильтр классов в NMS, без отрисовки остальных объектов.
+
+Пример:
+    python benchmarks/bench_detector.py --empty empty.jpg --bear bear.jpg --runs 20
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.detector import detect_bears
+
+
+MODES = {
+    'before': {'show_other_objects': True},
+    'after': {},
+}
+
+
+def time_detection(image_path, runs, **kwargs):
+    detect_bears(image_path, **kwargs)  # прогрев
+    timings = []
+    for _ in range(runs):
+        start_time = time.perf_counter()
+        detect_bears(image_path, **kwargs)
+        timings.append(time.perf_counter() - start_time)
+    return statistics.median(timings), min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--empty', required=True, help="Кадр без медведей")
+    parser.add_argument('--bear', required=True, help="Кадр с медведем")
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'кадр':<8} {'режим':<8} {'медиана, мс':>12} {'мин, мс':>10}")
+    for frame, image_path in (('empty', args.empty), ('bear', args.bear)):
+        for mode, kwargs in MODES.items():
+            median, best = time_detection(image_path, args.runs, **kwargs)
+            print(f"{frame:<8} {mode:<8} {median * 1000:>12.1f} {best * 1000:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""Полный PDF-отчет по синтетической истории: время и пиковая память.
+
+Сравнивается постраничная отрисовка (generate_full_pdf_report) с наивной
+сборкой одной таблицы reportlab через SimpleDocTemplate.
+
+Пример:
+    python benchmarks/bench_pdf_report.py --entries 50000 --naive-entries 5000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from reportlab.lib.pagesizes import A4
+from reportlab.platypus import SimpleDocTemplate, Table
+
+from benchmarks.bench_stats import make_history
+from utils.excel_reporter import register_pdf_fonts
+from utils.history_table import build_history_frames
+from utils.pdf_report import generate_full_pdf_report, TABLE_HEADER, TABLE_STYLE, _table_row
+
+
+def naive_pdf(history, path):
+    rows = [TABLE_HEADER] + [_table_row(index, item) for index, item in enumerate(history, 1)]
+    table = Table(rows, repeatRows=1)
+    table.setStyle(TABLE_STYLE)
+    SimpleDocTemplate(path, pagesize=A4).build([table])
+
+
+def measure(func, *args, **kwargs):
+    tracemalloc.start()
+    start_time = time.perf_counter()
+    result = func(*args, **kwargs)
+    duration = time.perf_counter() - start_time
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return duration, peak / 1024 / 1024, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--entries', type=int, default=50_000)
+    parser.add_argument('--naive-entries', type=int, default=5_000, help="0 — не запускать наивный вариант")
+    args = parser.parse_args()
+
+    register_pdf_fonts()
+    # make_history считает детекции, а не записи: берем с запасом и обрезаем
+    history = make_history(args.entries * 2)[:args.entries]
+    requests_df, detections_df = build_history_frames(history)
+    version = f'bench_{len(history)}'
+
+    # Отчеты и графики пишутся во временную папку: кэш графиков приложения не трогаем
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # Первый запуск рисует графики, второй берет их из кэша
+        for label in ('холодный кэш графиков', 'теплый кэш графиков'):
+            duration, peak, path = measure(
+                generate_full_pdf_report, iter(history), requests_df, detections_df, version,
+                output_folder=tmp_dir, cache_folder=tmp_dir
+            )
+            print(f"постранично, {len(history)} записей, {label}: {duration:.2f} с, "
+                  f"пик {peak:.1f} МБ, {os.path.getsize(path) / 1024 / 1024:.1f} МБ PDF")
+            os.remove(path)
+
+        if args.naive_entries:
+            subset = history[:args.naive_entries]
+            duration, peak, _ = measure(naive_pdf, subset, os.path.join(tmp_dir, 'naive.pdf'))
+            print(f"одна таблица, {len(subset)} записей: {duration:.2f} с, пик {peak:.1f} МБ")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""Время расчета сводной статистики: циклы по словарям vs group-by по таблицам.
+
+Пример:
+    python benchmarks/bench_stats.py --detections 10000 100000 1000000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+from utils.history_table import build_history_frames, summarize_frames
+
+
+def make_history(detection_count, seed=0):
+    rng = random.Random(seed)
+    start = datetime(2026, 1, 1)
+    history = []
+    produced = 0
+    while produced < detection_count:
+        bear_count = min(rng.choice([0, 0, 1, 1, 1, 2, 3]), detection_count - produced)
+        history.append({
+            'id': str(uuid.UUID(int=rng.getrandbits(128))),
+            'timestamp': (start + timedelta(seconds=len(history) * 37)).isoformat(),
+            'original_image': 'static/uploads/x.jpg',
+            'result_image': 'static/results/result_x.jpg',
+            'detections': [
+                {'bbox': [10.0, 20.0, 110.0, 220.0], 'confidence': rng.uniform(0.25, 1.0), 'class': 'bear'}
+                for _ in range(bear_count)
+            ],
+            'bear_count': bear_count,
+            'processing_time': rng.uniform(0.05, 0.5)
+        })
+        produced += bear_count
+    return history
+
+
+def legacy_summary(history_data):
+    # Прежняя реализация calculate_summary_statistics на циклах
+    total_requests = len(history_data)
+    total_bears = sum(item['bear_count'] for item in history_data)
+    all_confidences = [det['confidence'] for item in history_data for det in item['detections']]
+    summary = {
+        'avg_confidence': np.mean(all_confidences) if all_confidences else 0,
+        'max_confidence': max(all_confidences) if all_confidences else 0,
+        'min_confidence': min(all_confidences) if all_confidences else 0,
+    }
+    daily_stats = {}
+    for item in history_data:
+        date = item['timestamp'][:10]
+        stats = daily_stats.setdefault(date, {'count': 0, 'bears': 0, 'confidences': []})
+        stats['count'] += 1
+        stats['bears'] += item['bear_count']
+        stats['confidences'].extend(det['confidence'] for det in item['detections'])
+    summary['daily_stats'] = [
+        (date, np.mean(s['confidences']) if s['confidences'] else 0)
+        for date, s in sorted(daily_stats.items(), reverse=True)
+    ][:10]
+    summary['bears_per_request'] = total_bears / total_requests
+    return summary
+
+
+def timed(func, *args):
+    start_time = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start_time, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--detections', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    print(f"{'детекций':>10} {'циклы, с':>10} {'сборка таблиц, с':>17} "
+          f"{'group-by, с':>12} {'чтение parquet, с':>18}")
+    for detection_count in args.detections:
+        history = make_history(detection_count)
+
+        legacy_time, _ = timed(legacy_summary, history)
+        build_time, (requests_df, detections_df) = timed(build_history_frames, history)
+        summary_time, _ = timed(summarize_frames, requests_df, detections_df)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            requests_path = os.path.join(tmp_dir, 'requests.parquet')
+            detections_path = os.path.join(tmp_dir, 'detections.parquet')
+            requests_df.to_parquet(requests_path, index=False)
+            detections_df.to_parquet(detections_path, index=False)
+            read_time, _ = timed(lambda: (pd.read_parquet(requests_path), pd.read_parquet(detections_path)))
+
+        print(f"{detection_count:>10} {legacy_time:>10.3f} {build_time:>17.3f} "
+              f"{summary_time:>12.3f} {read_time:>18.3f}")
+
+
+if __name__ == '__main__':
+    main()
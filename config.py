@@ -5,13 +5,95 @@ BASE_DIR = Path(__file__).parent
 
 UPLOAD_FOLDER = BASE_DIR / 'static' / 'uploads'
 RESULT_FOLDER = BASE_DIR / 'static' / 'results'
-MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB
+RESULT_CACHE_FOLDER = RESULT_FOLDER / 'cache'
+# Лимит обычной загрузки формой (буферизуется Werkzeug)
+MAX_CONTENT_LENGTH = int(os.environ.get('BEAR_MAX_CONTENT_LENGTH', 64 * 1024 * 1024))  # 64MB
+# Потоковые и возобновляемые загрузки пишутся на диск частями и не буферизуются
+STREAM_UPLOAD_MAX_BYTES = int(os.environ.get('BEAR_STREAM_UPLOAD_MAX_BYTES', 8 * 1024 * 1024 * 1024))  # 8GB
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1MB
+PARTIAL_UPLOAD_FOLDER = UPLOAD_FOLDER / '.partial'
+# Недокачанные загрузки без активности дольше этого срока удаляются очисткой хранилища
+PARTIAL_UPLOAD_MAX_AGE_HOURS = 24
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.bmp', '.gif')
 
 MODEL_NAME = "yolo26s"
 CONFIDENCE_THRESHOLD = 0.25
 IOU_THRESHOLD = 0.45
 
+# Размер входа модели; JPEG декодируется в уменьшенном масштабе (DCT), но не меньше него
+MODEL_INPUT_SIZE = 640
+REDUCED_DECODE = True
+
+# В COCO class_id = 21 соответствует медведю; остальные классы отсекаются уже в NMS
+BEAR_CLASS_IDS = [21]
+# Отладка: рисовать найденные объекты других классов, если медведей нет
+SHOW_OTHER_OBJECTS = False
+
 HISTORY_FILE = BASE_DIR / 'history.json'
+# Колоночное представление истории (Parquet) для аналитики
+HISTORY_TABLE_FOLDER = BASE_DIR / 'history_table'
+
+# PDF-отчеты: шрифт с кириллицей и кэш графиков, перерисовываемых при изменении истории
+PDF_FONT_PATH = BASE_DIR / 'fonts' / 'DejaVuSans.ttf'
+PDF_ROWS_PER_PAGE = 40
+REPORT_CACHE_FOLDER = BASE_DIR / 'report_cache'
+
+# Ленивая отрисовка: при загрузке сохраняются только детекции,
+# размеченное изображение рисуется при первом запросе и кэшируется на диске
+LAZY_RESULT_RENDERING = False
+RESULT_CACHE_MAX_BYTES = 512 * 1024 * 1024  # 512MB
+
+# Группировка серий снимков фотоловушки по перцептивному хэшу. Применяется только
+# к загрузкам с явным source (камерой); окно считается по времени съемки из EXIF
+BURST_GROUPING_ENABLED = False
+BURST_WINDOW_SECONDS = 30
+BURST_HAMMING_THRESHOLD = 6
+
+# SSE-подписчик держит поток сервера и очередь на все время соединения. Встроенный
+# сервер (app.run) создает поток на каждое соединение без ограничения, поэтому лимит
+# защищает только от накопления потоков; при запуске через waitress он должен быть
+# меньше serve(app, threads=...), иначе зрители займут все потоки. Сверх лимита
+# страница раз в 30 с опрашивает /quick-stats — счетчики из памяти, без чтения истории
+SSE_MAX_SUBSCRIBERS = int(os.environ.get('BEAR_SSE_MAX_SUBSCRIBERS', 32))
+
+# Пакетная загрузка папок (ingest.py)
+INGEST_WORKERS = 2
+INGEST_BATCH_SIZE = 100
+# Каждая запись пакета переписывает весь history.json, поэтому пакет растет вместе
+# с историей (не меньше этой доли от ее размера) — суммарно O(N log N), а не O(N²)
+INGEST_BATCH_HISTORY_FRACTION = 0.05
+INGEST_CHECKPOINT_FOLDER = BASE_DIR / 'ingest_checkpoints'
+
+# Хранение файлов: новые файлы раскладываются по подпапкам ГГГГ/ММ/ДД,
+# фоновая очистка удерживает папки в пределах бюджетов по размеру и возрасту
+SHARD_BY_DATE = True
+RETENTION_POLICIES = {
+    'uploads': {
+        'max_bytes': 20 * 1024 * 1024 * 1024,  # 20GB
+        'max_age_days': 365,
+        'recompress_after_days': 30
+    },
+    'results': {
+        'max_bytes': 5 * 1024 * 1024 * 1024,  # 5GB
+        'max_age_days': 90
+    }
+}
+RECOMPRESS_FORMAT = 'JPEG'  # или 'WEBP'
+RECOMPRESS_QUALITY = 70
+RETENTION_SWEEP_INTERVAL = 0  # секунды; 0 — фоновая очистка выключена
+
+# Сводки оценки детектора (evaluate.py)
+EVAL_RESULTS_FOLDER = BASE_DIR / 'eval_results'
+
+# Профилирование отдельных запросов (заголовок X-Profile: 1 или ?profile=1).
+# При выключенном флаге обработчики не оборачиваются вовсе
+PROFILING_ENABLED = False
+PROFILE_FOLDER = BASE_DIR / 'profiles'
+PROFILE_MAX_FILES = 200
 
 UPLOAD_FOLDER.mkdir(parents=True, exist_ok=True)
-RESULT_FOLDER.mkdir(parents=True, exist_ok=True)
\ No newline at end of file
+PARTIAL_UPLOAD_FOLDER.mkdir(parents=True, exist_ok=True)
+RESULT_FOLDER.mkdir(parents=True, exist_ok=True)
+RESULT_CACHE_FOLDER.mkdir(parents=True, exist_ok=True)
+HISTORY_TABLE_FOLDER.mkdir(parents=True, exist_ok=True)
+REPORT_CACHE_FOLDER.mkdir(parents=True, exist_ok=True)
\ No newline at end of file
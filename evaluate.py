@@ -0,0 +1,226 @@
+"""Оценка качества и скорости детектора на размеченной папке (разметка YOLO).
+
+Структура набора: images/*.jpg и labels/*.txt со строками
+"class cx cy w h" в относительных координатах.
+
+Пример сравнения двух конфигураций:
+    python evaluate.py dataset/images --config base:conf=0.25 --config small:conf=0.25,imgsz=480
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+from datetime import datetime
+
+import numpy as np
+from PIL import Image
+
+from config import (CONFIDENCE_THRESHOLD, IOU_THRESHOLD, MODEL_INPUT_SIZE, MODEL_NAME, IMAGE_EXTENSIONS,
+                    EVAL_RESULTS_FOLDER)
+
+IOU_THRESHOLDS = np.linspace(0.5, 0.95, 10)
+
+CONFIG_KEYS = {
+    'conf': ('confidence_threshold', float),
+    'iou': ('iou_threshold', float),
+    'imgsz': ('input_size', int)
+}
+
+
+def parse_config(text):
+    """'name:conf=0.3,imgsz=480' -> (name, аргументы detect_bears)"""
+    name, _, options = text.partition(':')
+    kwargs = {
+        'confidence_threshold': CONFIDENCE_THRESHOLD,
+        'iou_threshold': IOU_THRESHOLD,
+        'input_size': MODEL_INPUT_SIZE
+    }
+    for option in filter(None, options.split(',')):
+        key, _, value = option.partition('=')
+        if key not in CONFIG_KEYS:
+            raise argparse.ArgumentTypeError(f"Неизвестный параметр конфигурации: {key}")
+        arg_name, cast = CONFIG_KEYS[key]
+        kwargs[arg_name] = cast(value)
+    return name, kwargs
+
+
+def find_dataset(images_dir, labels_dir):
+    samples = []
+    for name in sorted(os.listdir(images_dir)):
+        if not name.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        label_path = os.path.join(labels_dir, os.path.splitext(name)[0] + '.txt')
+        samples.append((os.path.join(images_dir, name), label_path))
+    return samples
+
+
+def load_labels(label_path, width, height, class_id):
+    boxes = []
+    if not os.path.exists(label_path):
+        return np.zeros((0, 4))
+
+    with open(label_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) < 5 or int(parts[0]) != class_id:
+                continue
+            cx, cy, w, h = (float(x) for x in parts[1:5])
+            boxes.append([
+                (cx - w / 2) * width, (cy - h / 2) * height,
+                (cx + w / 2) * width, (cy + h / 2) * height
+            ])
+    return np.array(boxes).reshape(-1, 4)
+
+
+def box_iou(box, boxes):
+    x1 = np.maximum(box[0], boxes[:, 0])
+    y1 = np.maximum(box[1], boxes[:, 1])
+    x2 = np.minimum(box[2], boxes[:, 2])
+    y2 = np.minimum(box[3], boxes[:, 3])
+    intersection = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    return intersection / (area + areas - intersection + 1e-9)
+
+
+def match_detections(detections, gt_boxes, iou_threshold):
+    """Жадное сопоставление по убыванию уверенности: список (уверенность, TP)"""
+    matched = np.zeros(len(gt_boxes), dtype=bool)
+    records = []
+    for det in sorted(detections, key=lambda d: d['confidence'], reverse=True):
+        is_tp = False
+        if len(gt_boxes):
+            ious = box_iou(np.array(det['bbox']), gt_boxes)
+            ious[matched] = 0
+            best = int(np.argmax(ious))
+            if ious[best] >= iou_threshold:
+                matched[best] = True
+                is_tp = True
+        records.append((det['confidence'], is_tp))
+    return records
+
+
+def average_precision(records, gt_count):
+    if gt_count == 0 or not records:
+        return 0.0
+
+    records = sorted(records, key=lambda r: r[0], reverse=True)
+    tp = np.cumsum([r[1] for r in records])
+    fp = np.cumsum([not r[1] for r in records])
+    recall = tp / gt_count
+    precision = tp / (tp + fp)
+
+    # Площадь под огибающей кривой точность-полнота (все точки)
+    recall = np.concatenate(([0.0], recall, [1.0]))
+    precision = np.concatenate(([1.0], precision, [0.0]))
+    precision = np.maximum.accumulate(precision[::-1])[::-1]
+    changes = np.where(recall[1:] != recall[:-1])[0]
+    return float(np.sum((recall[changes + 1] - recall[changes]) * precision[changes + 1]))
+
+
+def evaluate_config(detect_bears, samples, label_class, kwargs):
+    records = {float(t): [] for t in IOU_THRESHOLDS}
+    latencies = []
+    gt_count = 0
+
+    # Прогрев модели, чтобы не учитывать инициализацию в задержке
+    if samples:
+        detect_bears(samples[0][0], return_image=False, **kwargs)
+
+    start_time = time.perf_counter()
+    for image_path, label_path in samples:
+        with Image.open(image_path) as image:
+            width, height = image.size
+        gt_boxes = load_labels(label_path, width, height, label_class)
+        gt_count += len(gt_boxes)
+
+        image_start = time.perf_counter()
+        detections, _ = detect_bears(image_path, return_image=False, **kwargs)
+        latencies.append(time.perf_counter() - image_start)
+
+        for threshold in records:
+            records[threshold].extend(match_detections(detections, gt_boxes, threshold))
+    total_time = time.perf_counter() - start_time
+
+    at_50 = records[0.5]
+    tp = sum(1 for _, is_tp in at_50 if is_tp)
+    ap_per_threshold = [average_precision(r, gt_count) for r in records.values()]
+    latencies_ms = sorted(l * 1000 for l in latencies)
+
+    return {
+        'params': kwargs,
+        'images': len(samples),
+        'ground_truth': gt_count,
+        'detections': len(at_50),
+        'precision': tp / len(at_50) if at_50 else 0.0,
+        'recall': tp / gt_count if gt_count else 0.0,
+        'map50': ap_per_threshold[0],
+        'map50_95': float(np.mean(ap_per_threshold)),
+        'latency_ms': {
+            'mean': statistics.mean(latencies_ms) if latencies_ms else 0.0,
+            'p50': latencies_ms[len(latencies_ms) // 2] if latencies_ms else 0.0,
+            'p95': latencies_ms[int(len(latencies_ms) * 0.95)] if latencies_ms else 0.0
+        },
+        'throughput': len(samples) / total_time if total_time > 0 else 0.0
+    }
+
+
+def print_comparison(results):
+    rows = [
+        ('Точность (IoU 0.5)', lambda r: f"{r['precision']:.3f}"),
+        ('Полнота (IoU 0.5)', lambda r: f"{r['recall']:.3f}"),
+        ('mAP50', lambda r: f"{r['map50']:.3f}"),
+        ('mAP50-95', lambda r: f"{r['map50_95']:.3f}"),
+        ('Задержка p50, мс', lambda r: f"{r['latency_ms']['p50']:.1f}"),
+        ('Задержка p95, мс', lambda r: f"{r['latency_ms']['p95']:.1f}"),
+        ('Изобр/с', lambda r: f"{r['throughput']:.2f}")
+    ]
+    names = list(results)
+    print(f"{'':<22}" + ''.join(f"{name:>14}" for name in names))
+    for title, value in rows:
+        print(f"{title:<22}" + ''.join(f"{value(results[name]):>14}" for name in names))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Оценка детектора медведей на размеченном наборе")
+    parser.add_argument('images', help="Папка с изображениями")
+    parser.add_argument('--labels', default=None, help="Папка с разметкой YOLO (по умолчанию ../labels)")
+    parser.add_argument('--label-class', type=int, default=0, help="Класс медведя в разметке")
+    parser.add_argument('--config', action='append', type=parse_config, default=None,
+                        help="Конфигурация name:conf=...,iou=...,imgsz=...; можно указать несколько")
+    parser.add_argument('--output', default=None, help="Путь к JSON-сводке")
+    args = parser.parse_args()
+
+    labels_dir = args.labels or os.path.join(os.path.dirname(os.path.abspath(args.images)), 'labels')
+    configs = args.config or [parse_config('default')]
+    samples = find_dataset(args.images, labels_dir)
+    print(f"📂 Изображений: {len(samples)}, разметка: {labels_dir}")
+
+    from models.detector import detect_bears
+
+    results = {}
+    for name, kwargs in configs:
+        print(f"🔄 Конфигурация {name}: {kwargs}")
+        results[name] = evaluate_config(detect_bears, samples, args.label_class, kwargs)
+
+    print_comparison(results)
+
+    summary = {
+        'timestamp': datetime.now().isoformat(),
+        'model': MODEL_NAME,
+        'dataset': os.path.abspath(args.images),
+        'results': results
+    }
+    output_path = args.output or os.path.join(
+        EVAL_RESULTS_FOLDER, f"eval_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+
+    print(f"✅ Сводка сохранена: {output_path}")
+
+
+if __name__ == '__main__':
+    main()
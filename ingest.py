@@ -0,0 +1,272 @@
+"""Пакетная загрузка папки с изображениями (например, дамп SD-карты фотоловушки).
+
+Пример:
+    python ingest.py /mnt/sdcard/DCIM --workers 4 --source camera-07
+
+С --source кадры группируются в серии (по перцептивному хэшу и времени съемки
+из EXIF): модель запускается на первом кадре серии, остальные получают его детекции.
+Без --source, а также кадры без времени съемки в EXIF, обрабатываются по отдельности.
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+from multiprocessing import Pool
+
+from config import (INGEST_WORKERS, INGEST_BATCH_SIZE, INGEST_BATCH_HISTORY_FRACTION, INGEST_CHECKPOINT_FOLDER,
+                    IMAGE_EXTENSIONS)
+from utils.file_handler import copy_local_file, result_name
+from utils.history_manager import append_history, build_history_entry, iter_history
+from utils.result_renderer import cached_result_url
+from utils.burst_grouping import burst_index, frame_signature, burst_fields, new_burst_id
+
+_detect_bears = None
+
+
+def find_images(root):
+    images = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                full_path = os.path.join(dirpath, name)
+                images.append(os.path.relpath(full_path, root))
+    return images
+
+
+def default_checkpoint_path(root):
+    digest = hashlib.sha1(os.path.abspath(root).encode('utf-8')).hexdigest()[:12]
+    return os.path.join(INGEST_CHECKPOINT_FOLDER, f'ingest_{digest}.json')
+
+
+def load_checkpoint(path):
+    if not os.path.exists(path):
+        return set()
+    with open(path, 'r', encoding='utf-8') as f:
+        return set(json.load(f).get('done', []))
+
+
+def save_checkpoint(path, root, done):
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump({'root': os.path.abspath(root), 'done': sorted(done)}, f, ensure_ascii=False)
+    os.replace(temp_path, path)
+
+
+def load_ingested_paths():
+    """Исходные пути уже записанных в историю файлов и размер истории"""
+    ingested = set()
+    history_size = 0
+    for item in iter_history():
+        history_size += 1
+        if item.get('ingest_path'):
+            ingested.add(item['ingest_path'])
+    return ingested, history_size
+
+
+def init_worker():
+    # Каждый процесс загружает собственную копию модели
+    global _detect_bears
+    from models.detector import detect_bears
+    _detect_bears = detect_bears
+
+
+def hash_image(task):
+    rel_path, source_path = task
+    try:
+        phash, captured_at = frame_signature(source_path)
+    except Exception as e:
+        return rel_path, source_path, None, None, str(e)
+    return rel_path, source_path, phash, captured_at, None
+
+
+def group_bursts(frames, source):
+    """Последовательная группировка кадров по времени съемки.
+
+    Возвращает задачи: кадры одной серии и известные детекции (если серия
+    продолжает уже записанную в историю) или None.
+    """
+    bursts = {}
+    for rel_path, source_path, phash, captured_at in sorted(frames, key=lambda f: f[3]):
+        match = burst_index.find(source, phash, captured_at)
+        if match is not None:
+            burst_id = match['burst_id']
+            if burst_id not in bursts:
+                bursts[burst_id] = {'detections': match['detections'], 'frames': []}
+        else:
+            burst_id = new_burst_id()
+            bursts[burst_id] = {'detections': None, 'frames': []}
+
+        bursts[burst_id]['frames'].append((rel_path, source_path, phash, captured_at))
+        # Детекции кадров этого запуска еще неизвестны, индексу нужны только хэш и время
+        burst_index.add({
+            'source': source,
+            'phash': f'{phash:016x}',
+            'timestamp': captured_at.isoformat(),
+            'burst_id': burst_id,
+            'detections': None
+        })
+
+    return [
+        {'source': source, 'burst_id': burst_id, 'detections': burst['detections'], 'frames': burst['frames']}
+        for burst_id, burst in bursts.items()
+    ]
+
+
+def single_frame_tasks(frames):
+    """Задачи без группировки: каждый кадр обрабатывается моделью отдельно"""
+    return [
+        {'source': None, 'burst_id': None, 'detections': None,
+         'frames': [(rel_path, source_path, None, None)]}
+        for rel_path, source_path in frames
+    ]
+
+
+def build_ingest_entry(frame, filename, detections, processing_time, task, representative):
+    rel_path, source_path, phash, captured_at = frame
+    entry = build_history_entry(
+        filename,
+        detections,
+        processing_time,
+        cached_result_url(result_name(filename)),
+        lazy_render=True
+    )
+    entry['ingest_path'] = os.path.abspath(source_path)
+    if task['burst_id'] is not None:
+        entry.update(burst_fields(task['source'], phash, captured_at, task['burst_id'], representative))
+    return rel_path, entry, None
+
+
+def process_burst(task):
+    frames = task['frames']
+    detections = task['detections']
+    results = []
+
+    if detections is None:
+        # Модель запускается только на первом кадре серии
+        start_time = time.time()
+        try:
+            filename, upload_path = copy_local_file(frames[0][1])
+            detections, _ = _detect_bears(upload_path, return_image=False)
+        except Exception as e:
+            return [(frame[0], None, str(e)) for frame in frames]
+        results.append(build_ingest_entry(frames[0], filename, detections, time.time() - start_time, task, True))
+        frames = frames[1:]
+
+    for frame in frames:
+        start_time = time.time()
+        try:
+            filename, _ = copy_local_file(frame[1])
+        except Exception as e:
+            results.append((frame[0], None, str(e)))
+            continue
+        results.append(build_ingest_entry(frame, filename, detections, time.time() - start_time, task, False))
+
+    return results
+
+
+def format_eta(seconds):
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{hours:d}:{minutes:02d}:{seconds:02d}"
+
+
+def ingest(root, workers=INGEST_WORKERS, batch_size=INGEST_BATCH_SIZE, checkpoint_path=None, source=None):
+    checkpoint_path = checkpoint_path or default_checkpoint_path(root)
+    os.makedirs(os.path.dirname(os.path.abspath(checkpoint_path)), exist_ok=True)
+
+    done = load_checkpoint(checkpoint_path)
+    # Файлы, попавшие в историю, но не в чекпоинт (сбой между двумя записями), не дублируем
+    ingested, history_size = load_ingested_paths()
+    pending = [
+        p for p in find_images(root)
+        if p not in done and os.path.abspath(os.path.join(root, p)) not in ingested
+    ]
+    total = len(pending)
+
+    print(f"📂 {root}: уже обработано {len(done)}, осталось {total}")
+    if not pending:
+        return
+
+    frames = [(rel_path, os.path.join(root, rel_path)) for rel_path in pending]
+    batch = []
+    batch_paths = []
+    processed = 0
+    failed = 0
+    start_time = time.time()
+
+    def flush():
+        # Сначала история, затем чекпоинт; уже записанные файлы при возобновлении
+        # отсеиваются по ingest_path
+        nonlocal history_size
+        if batch:
+            append_history(batch)
+            history_size += len(batch)
+        done.update(batch_paths)
+        save_checkpoint(checkpoint_path, root, done)
+        batch.clear()
+        batch_paths.clear()
+
+    with Pool(processes=workers, initializer=init_worker) as pool:
+        if source:
+            hashed = []
+            untimed = []
+            for rel_path, source_path, phash, captured_at, error in pool.imap(hash_image, frames, chunksize=16):
+                if error is not None:
+                    processed += 1
+                    failed += 1
+                    print(f"⚠️ {rel_path}: {error}")
+                elif captured_at is None:
+                    # Без EXIF время съемки неизвестно: такие кадры не группируются
+                    untimed.append((rel_path, source_path))
+                else:
+                    hashed.append((rel_path, source_path, phash, captured_at))
+            tasks = group_bursts(hashed, source) + single_frame_tasks(untimed)
+            print(f"🔗 Серий снимков: {len(tasks) - len(untimed)} на {len(hashed)} кадров, "
+                  f"без времени съемки: {len(untimed)}")
+        else:
+            tasks = single_frame_tasks(frames)
+
+        for results in pool.imap_unordered(process_burst, tasks, chunksize=4):
+            for rel_path, entry, error in results:
+                processed += 1
+                if error is not None:
+                    failed += 1
+                    print(f"⚠️ {rel_path}: {error}")
+                else:
+                    batch.append(entry)
+                    batch_paths.append(rel_path)
+
+            current_batch_size = max(batch_size, int(history_size * INGEST_BATCH_HISTORY_FRACTION))
+            if len(batch) >= current_batch_size or processed == total:
+                flush()
+
+                elapsed = time.time() - start_time
+                rate = processed / elapsed if elapsed > 0 else 0
+                eta = (total - processed) / rate if rate > 0 else 0
+                print(f"🔄 {processed}/{total} | {rate:.2f} изобр/с | ETA {format_eta(eta)}")
+
+        # Ошибки хэширования могли оставить хвост без итоговой записи
+        if batch or batch_paths:
+            flush()
+
+    elapsed = time.time() - start_time
+    print(f"✅ Готово: {processed - failed} изображений за {format_eta(elapsed)}, ошибок: {failed}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Пакетная детекция медведей в папке с изображениями")
+    parser.add_argument('directory', help="Папка с изображениями")
+    parser.add_argument('--workers', type=int, default=INGEST_WORKERS, help="Число процессов (у каждого своя модель)")
+    parser.add_argument('--batch-size', type=int, default=INGEST_BATCH_SIZE, help="Минимальный размер пакета записи в историю")
+    parser.add_argument('--checkpoint', default=None, help="Путь к файлу чекпоинта")
+    parser.add_argument('--source', default=None, help="Источник (камера); включает группировку серий снимков")
+    args = parser.parse_args()
+
+    ingest(args.directory, args.workers, args.batch_size, args.checkpoint, args.source)
+
+
+if __name__ == '__main__':
+    main()
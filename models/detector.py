@@ -1,30 +1,33 @@
 import cv2
-import numpy as np
-from PIL import Image
 
-from config import CONFIDENCE_THRESHOLD, IOU_THRESHOLD
+from config import (CONFIDENCE_THRESHOLD, IOU_THRESHOLD, BEAR_CLASS_IDS, SHOW_OTHER_OBJECTS,
+                    MODEL_INPUT_SIZE, REDUCED_DECODE)
 from models.model_loader import model
+from utils.image_loader import load_image, scale_detection
 
 
-def detect_bears(image_path,confidence_threshold=CONFIDENCE_THRESHOLD,iou_threshold=IOU_THRESHOLD):
+def detect_bears(image_path,confidence_threshold=CONFIDENCE_THRESHOLD,iou_threshold=IOU_THRESHOLD,
+                 classes=BEAR_CLASS_IDS,show_other_objects=SHOW_OTHER_OBJECTS,
+                 input_size=MODEL_INPUT_SIZE,return_image=True):
 
-    # Загружаем изображение
-    image = Image.open(image_path)
-    if image.mode != "RGB":
-        image = image.convert("RGB")
+    # Загружаем изображение. Полноразмерное декодирование нужно только для отрисовки
+    # результата; иначе JPEG декодируется сразу в масштабе, близком к входу модели
+    reduced = REDUCED_DECODE and not return_image
+    image_np, scale = load_image(image_path, input_size if reduced else None)
 
-    image_np = np.array(image)
-
-    # Запускаем модель
+    # Запускаем модель; фильтр классов применяется до NMS,
+    # для отладочной отрисовки остальных объектов он отключается
     results = model(
         image_np,
         conf=confidence_threshold,
         iou=iou_threshold,
+        classes=None if show_other_objects else classes,
+        imgsz=input_size,
         verbose=False
     )
 
     detections = []
-    result_image = image_np.copy()
+    result_image = image_np if return_image else None
 
     # YOLO может вернуть несколько результатов (обычно один)
     for result in results:
@@ -34,8 +37,7 @@ def detect_bears(image_path,confidence_threshold=CONFIDENCE_THRESHOLD,iou_thresh
         for box in result.boxes:
             class_id = int(box.cls[0])
 
-            # В COCO class_id = 21 соответствует медведю
-            if class_id != 21:
+            if class_id not in classes:
                 continue
 
             confidence = float(box.conf[0])
@@ -44,7 +46,8 @@ def detect_bears(image_path,confidence_threshold=CONFIDENCE_THRESHOLD,iou_thresh
             bbox = [float(x1), float(y1), float(x2), float(y2)]
             area = (x2 - x1) * (y2 - y1)
 
-            detections.append({
+            # Координаты возвращаются в системе исходного изображения
+            detections.append(scale_detection({
                 "bbox": bbox,
                 "confidence": confidence,
                 "class": "bear",
@@ -52,10 +55,10 @@ def detect_bears(image_path,confidence_threshold=CONFIDENCE_THRESHOLD,iou_thresh
                 "area": float(area),
                 "center_x": float((x1 + x2) / 2),
                 "center_y": float((y1 + y2) / 2)
-            })
+            }, scale))
 
-        # Если медведей нет — используем стандартный вывод YOLO
-        if not detections:
+        # Если медведей нет — в режиме отладки используем стандартный вывод YOLO
+        if not detections and show_other_objects and return_image:
             plotted = result.plot()
             result_image = cv2.cvtColor(plotted, cv2.COLOR_BGR2RGB)
 
@@ -0,0 +1,182 @@
+import threading
+import uuid
+from datetime import datetime
+
+from PIL import Image
+
+from config import BURST_WINDOW_SECONDS, BURST_HAMMING_THRESHOLD
+from utils.history_manager import iter_history
+
+
+def compute_dhash(image_path, hash_size=8):
+    """64-битный разностный хэш (dHash) изображения"""
+    image = Image.open(image_path)
+    # Для хэша достаточно сильно уменьшенного JPEG
+    image.draft('L', (hash_size * 4, hash_size * 4))
+    image = image.convert('L').resize((hash_size + 1, hash_size), Image.BILINEAR)
+
+    pixels = list(image.getdata())
+    value = 0
+    for row in range(hash_size):
+        for col in range(hash_size):
+            left = pixels[row * (hash_size + 1) + col]
+            right = pixels[row * (hash_size + 1) + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+EXIF_IFD = 0x8769
+EXIF_DATETIME_ORIGINAL = 36867
+EXIF_DATETIME = 306
+
+
+def capture_time(image_path):
+    """Время съемки из EXIF (DateTimeOriginal, затем DateTime) или None"""
+    try:
+        with Image.open(image_path) as image:
+            exif = image.getexif()
+            value = exif.get_ifd(EXIF_IFD).get(EXIF_DATETIME_ORIGINAL) or exif.get(EXIF_DATETIME)
+    except (OSError, ValueError):
+        return None
+
+    if not value:
+        return None
+    try:
+        return datetime.strptime(str(value).strip('\x00 '), '%Y:%m:%d %H:%M:%S')
+    except ValueError:
+        return None
+
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count('1')
+
+
+class BKTree:
+    """BK-дерево по расстоянию Хэмминга для поиска похожих хэшей"""
+
+    def __init__(self):
+        self.root = None
+
+    def add(self, value, item):
+        if self.root is None:
+            self.root = (value, [item], {})
+            return
+
+        node = self.root
+        while True:
+            distance = hamming_distance(value, node[0])
+            if distance == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = (value, [item], {})
+                return
+            node = child
+
+    def search(self, value, max_distance):
+        found = []
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node_value, items, children = stack.pop()
+            distance = hamming_distance(value, node_value)
+            if distance <= max_distance:
+                found.extend((distance, item) for item in items)
+            for child_distance, child in children.items():
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    stack.append(child)
+        return found
+
+
+class BurstIndex:
+    """Индекс кадров по источнику: хэш -> серия, к которой кадр относится.
+
+    Окно серии отсчитывается от ее первого кадра, а не от ближайшего: иначе
+    кадры с интервалом меньше окна сцепляются в одну бесконечную серию.
+    """
+
+    def __init__(self, window_seconds=BURST_WINDOW_SECONDS, max_distance=BURST_HAMMING_THRESHOLD):
+        self.window_seconds = window_seconds
+        self.max_distance = max_distance
+        self._trees = None
+        # burst_id -> [время первого кадра, время последнего кадра]
+        self._spans = {}
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._trees is None:
+            self._trees = {}
+            for item in iter_history():
+                if item.get('phash') and item.get('burst_id'):
+                    self._add(item)
+
+    def _add(self, entry):
+        timestamp = datetime.fromisoformat(entry.get('captured_at') or entry['timestamp'])
+        tree = self._trees.setdefault(entry.get('source'), BKTree())
+        tree.add(int(entry['phash'], 16), {
+            'timestamp': timestamp,
+            'burst_id': entry['burst_id'],
+            'detections': entry['detections']
+        })
+
+        span = self._spans.get(entry['burst_id'])
+        if span is None:
+            self._spans[entry['burst_id']] = [timestamp, timestamp]
+        else:
+            span[0] = min(span[0], timestamp)
+            span[1] = max(span[1], timestamp)
+
+    def _fits_window(self, burst_id, timestamp):
+        first, last = self._spans[burst_id]
+        return (max(last, timestamp) - min(first, timestamp)).total_seconds() <= self.window_seconds
+
+    def find(self, source, phash, timestamp):
+        """Ближайший кадр серии, в окно которой попадает timestamp, или None"""
+        with self._lock:
+            self._load()
+            tree = self._trees.get(source)
+            if tree is None:
+                return None
+
+            candidates = [
+                (distance, abs((timestamp - item['timestamp']).total_seconds()), item)
+                for distance, item in tree.search(phash, self.max_distance)
+                if self._fits_window(item['burst_id'], timestamp)
+            ]
+            if not candidates:
+                return None
+            return min(candidates, key=lambda c: (c[0], c[1]))[2]
+
+    def add(self, entry):
+        with self._lock:
+            self._load()
+            self._add(entry)
+
+
+burst_index = BurstIndex()
+
+
+def new_burst_id():
+    return uuid.uuid4().hex
+
+
+def frame_signature(image_path, fallback_to_now=False):
+    """Перцептивный хэш и время съемки из EXIF.
+
+    Без EXIF время неизвестно (None); fallback_to_now подставляет время загрузки —
+    это имеет смысл только для кадров, которые камера отправляет сразу после съемки.
+    """
+    captured_at = capture_time(image_path)
+    if captured_at is None and fallback_to_now:
+        captured_at = datetime.now()
+    return compute_dhash(image_path), captured_at
+
+
+def burst_fields(source, phash, captured_at, burst_id, representative):
+    return {
+        'source': source,
+        'phash': f'{phash:016x}',
+        'captured_at': captured_at.isoformat(),
+        'burst_id': burst_id,
+        'burst_representative': representative
+    }
@@ -0,0 +1,164 @@
+import json
+import queue
+import threading
+from datetime import datetime
+
+from config import SSE_MAX_SUBSCRIBERS
+from utils.history_manager import history_version
+from utils.history_table import load_history_frames_versioned
+
+SUBSCRIBER_QUEUE_SIZE = 100
+KEEPALIVE_SECONDS = 15
+
+
+def format_sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+class StatsBroadcaster:
+    """Рассылка новых детекций и быстрой статистики подписчикам SSE.
+
+    Счетчики строятся по истории один раз, далее обновляются на каждое событие,
+    поэтому стоимость не зависит ни от размера истории, ни от числа зрителей.
+    Если историю изменил другой процесс (ingest.py, очистка хранилища),
+    счетчики перестраиваются по новой версии.
+    """
+
+    def __init__(self, max_subscribers=SSE_MAX_SUBSCRIBERS):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._max_subscribers = max_subscribers
+        self._stats = None
+        self._version = None
+
+    def _load(self):
+        if self._stats is not None and self._version == history_version():
+            return False
+
+        requests_df, detections_df, version = load_history_frames_versioned()
+        today = datetime.now().strftime("%Y-%m-%d")
+        today_df = requests_df[requests_df['date'] == today]
+
+        self._version = version
+        self._stats = {
+            'date': today,
+            'total': len(requests_df),
+            'bears_total': int(requests_df['bear_count'].sum()),
+            'events_total': int(requests_df['burst_id'].nunique()),
+            'today': len(today_df),
+            'today_bears': int(today_df['bear_count'].sum()),
+            'confidence_sum': float(detections_df['confidence'].sum()),
+            'confidence_count': len(detections_df)
+        }
+        return True
+
+    def _roll_date(self):
+        stats = self._stats
+        today = datetime.now().strftime("%Y-%m-%d")
+        if stats['date'] != today:
+            stats.update({'date': today, 'today': 0, 'today_bears': 0})
+
+    def _snapshot(self):
+        self._roll_date()
+        stats = self._stats
+        count = stats['confidence_count']
+        return {
+            'total': stats['total'],
+            'bears_total': stats['bears_total'],
+            'events_total': stats['events_total'],
+            'today': stats['today'],
+            'today_bears': stats['today_bears'],
+            'avg_confidence': stats['confidence_sum'] / count if count else 0
+        }
+
+    def snapshot(self):
+        with self._lock:
+            self._load()
+            return self._snapshot()
+
+    def subscribe(self):
+        """Новый подписчик или None, если лимит соединений исчерпан"""
+        with self._lock:
+            if len(self._subscribers) >= self._max_subscribers:
+                return None
+            subscriber = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def _broadcast(self, messages):
+        for subscriber in list(self._subscribers):
+            for message in messages:
+                try:
+                    subscriber.put_nowait(message)
+                except queue.Full:
+                    # Медленный клиент: отключаем, браузер переподключится сам
+                    self._subscribers.discard(subscriber)
+                    try:
+                        subscriber.get_nowait()
+                    except queue.Empty:
+                        pass
+                    subscriber.put_nowait(None)
+                    break
+
+    def refresh_if_stale(self):
+        """Перестраивает счетчики после записи другим процессом и рассылает их"""
+        with self._lock:
+            if self._stats is not None and self._load():
+                self._broadcast([('stats', self._snapshot())])
+
+    def publish(self, entry, versions):
+        """Новая запись этого процесса; versions — результат append_history"""
+        version_before, version_after = versions
+        with self._lock:
+            if self._stats is not None and self._version == version_before:
+                # Между загрузкой и записью историю никто не менял — достаточно дельты
+                self._version = version_after
+                self._roll_date()
+
+                stats = self._stats
+                stats['total'] += 1
+                stats['bears_total'] += entry['bear_count']
+                if entry.get('burst_representative', True):
+                    stats['events_total'] += 1
+                if entry['timestamp'].startswith(stats['date']):
+                    stats['today'] += 1
+                    stats['today_bears'] += entry['bear_count']
+                for det in entry['detections']:
+                    stats['confidence_sum'] += det['confidence']
+                    stats['confidence_count'] += 1
+            else:
+                # Пропущены чужие записи: перечитываем историю, запись уже в ней
+                self._stats = None
+                self._load()
+
+            detection = {
+                'id': entry['id'],
+                'timestamp': entry['timestamp'],
+                'bear_count': entry['bear_count'],
+                'burst_id': entry.get('burst_id'),
+                'burst_representative': entry.get('burst_representative', True),
+                'result_image': entry['result_image'],
+                'confidences': [det['confidence'] for det in entry['detections']]
+            }
+            self._broadcast([('detection', detection), ('stats', self._snapshot())])
+
+
+broadcaster = StatsBroadcaster()
+
+
+def iter_events(subscriber):
+    yield format_sse('stats', broadcaster.snapshot())
+    while True:
+        try:
+            message = subscriber.get(timeout=KEEPALIVE_SECONDS)
+        except queue.Empty:
+            broadcaster.refresh_if_stale()
+            yield ': keepalive\n\n'
+            continue
+        if message is None:
+            return
+        yield format_sse(*message)
@@ -1,7 +1,7 @@
 import os
 import json
+import zipfile
 from datetime import datetime
-import numpy as np
 from openpyxl import Workbook
 from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
 
@@ -13,7 +13,8 @@ from reportlab.lib.pagesizes import A4
 from reportlab.lib import colors
 
 
-from config import RESULT_FOLDER
+from config import RESULT_FOLDER, PDF_FONT_PATH
+from utils.history_table import build_history_frames, request_confidence_stats, save_history_frames
 
 def setup_excel_styles():
     styles = {
@@ -151,6 +152,14 @@ def create_summary_sheet(wb, styles, history_data):
     ws[f'A{row}'] = "Медведей на запрос (средн.)"
     ws[f'B{row}'] = summary_data['bears_per_request']
     ws[f'B{row}'].number_format = '0.00'
+    row += 1
+    
+    ws[f'A{row}'] = "Всего событий (серий снимков)"
+    ws[f'B{row}'] = summary_data['total_events']
+    row += 1
+    
+    ws[f'A{row}'] = "Медведей по событиям"
+    ws[f'B{row}'] = summary_data['event_bears']
     row += 2
     
     # Статистика по дням
@@ -163,7 +172,7 @@ def create_summary_sheet(wb, styles, history_data):
     daily_stats = summary_data['daily_stats']
     
     # Заголовки таблицы
-    headers = ['Дата', 'Запросов', 'Медведей', 'Ср. уверенность', 'Макс. уверенность']
+    headers = ['Дата', 'Запросов', 'Событий', 'Медведей', 'Ср. уверенность', 'Макс. уверенность']
     for col_idx, header in enumerate(headers, 1):
         cell = ws.cell(row=row, column=col_idx, value=header)
         cell.font = styles['header_font']
@@ -177,11 +186,12 @@ def create_summary_sheet(wb, styles, history_data):
     for day_stat in daily_stats:
         ws.cell(row=row, column=1, value=day_stat['date']).border = styles['border']
         ws.cell(row=row, column=2, value=day_stat['count']).border = styles['border']
-        ws.cell(row=row, column=3, value=day_stat['bears']).border = styles['border']
-        ws.cell(row=row, column=4, value=day_stat['avg_confidence']).border = styles['border']
-        ws.cell(row=row, column=4).number_format = styles['percent_format']
-        ws.cell(row=row, column=5, value=day_stat['max_confidence']).border = styles['border']
+        ws.cell(row=row, column=3, value=day_stat['events']).border = styles['border']
+        ws.cell(row=row, column=4, value=day_stat['bears']).border = styles['border']
+        ws.cell(row=row, column=5, value=day_stat['avg_confidence']).border = styles['border']
         ws.cell(row=row, column=5).number_format = styles['percent_format']
+        ws.cell(row=row, column=6, value=day_stat['max_confidence']).border = styles['border']
+        ws.cell(row=row, column=6).number_format = styles['percent_format']
         row += 1
     
     # Автоподбор ширины колонок
@@ -215,21 +225,24 @@ def create_details_sheet(wb, styles, history_data):
     
     row += 1
     
+    # Метрики уверенности по запросам считаются одним group-by
+    _, detections_df = build_history_frames(history_data)
+    confidence_stats = request_confidence_stats(detections_df)
+    
     # Данные запросов
     for idx, item in enumerate(history_data, 1):
-        # Расчет метрик (только уверенности, без площадей)
         detections = item['detections']
         
-        if detections:
-            confidences = [d['confidence'] for d in detections]
-            avg_confidence = np.mean(confidences)
-            max_confidence = max(confidences)
-            min_confidence = min(confidences)
+        if item['id'] in confidence_stats:
+            stats = confidence_stats[item['id']]
+            avg_confidence = stats['mean']
+            max_confidence = stats['max']
+            min_confidence = stats['min']
         else:
             avg_confidence = max_confidence = min_confidence = 0
         
         # Определение типа файла
-        filename = item.get('original_image', '')
+        filename = item.get('original_image') or ''
         if filename.lower().endswith(('.mp4', '.avi', '.mov')):
             file_type = 'Видео'
         else:
@@ -283,9 +296,30 @@ def generate_json_report(history_data):
     print(f"✅ JSON отчет создан: {file_path}")
     return file_path
 
+def generate_parquet_report(requests_df, detections_df):
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    filename = f"bear_detection_report_{timestamp}.zip"
+    file_path = os.path.join(RESULT_FOLDER, filename)
+
+    requests_path = os.path.join(RESULT_FOLDER, f"requests_{timestamp}.parquet")
+    detections_path = os.path.join(RESULT_FOLDER, f"detections_{timestamp}.parquet")
+    save_history_frames(requests_df, detections_df, requests_path, detections_path)
+
+    # Parquet уже сжат, поэтому файлы складываются в архив без сжатия
+    with zipfile.ZipFile(file_path, 'w', zipfile.ZIP_STORED) as archive:
+        archive.write(requests_path, 'requests.parquet')
+        archive.write(detections_path, 'detections.parquet')
+
+    os.remove(requests_path)
+    os.remove(detections_path)
+
+    print(f"✅ Parquet отчет создан: {file_path}")
+    return file_path
+
 def register_pdf_fonts():
-    font_path = os.path.join('fonts', 'DejaVuSans.ttf')
-    pdfmetrics.registerFont(TTFont('DejaVu', font_path))
+    # Шрифт регистрируется один раз на процесс
+    if 'DejaVu' not in pdfmetrics.getRegisteredFontNames():
+        pdfmetrics.registerFont(TTFont('DejaVu', str(PDF_FONT_PATH)))
 
 
 
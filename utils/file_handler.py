@@ -1,19 +1,42 @@
 import os
+import shutil
 import uuid
+from datetime import datetime
 from PIL import Image
-from config import UPLOAD_FOLDER, RESULT_FOLDER
+from config import UPLOAD_FOLDER, RESULT_FOLDER, SHARD_BY_DATE
+
+def shard_path(filename, date=None):
+    """Имя файла с подпапкой ГГГГ/ММ/ДД, чтобы каталоги оставались небольшими"""
+    if not SHARD_BY_DATE:
+        return filename
+    date = date or datetime.now()
+    return f"{date:%Y/%m/%d}/{filename}"
+
+def _prepare_path(folder, filename):
+    path = os.path.join(folder, filename)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
 
 def save_uploaded_file(file):
-    filename = f"{uuid.uuid4().hex}_{file.filename}"
-    upload_path = os.path.join(UPLOAD_FOLDER, filename)
+    filename = shard_path(f"{uuid.uuid4().hex}_{os.path.basename(file.filename)}")
+    upload_path = _prepare_path(UPLOAD_FOLDER, filename)
     file.save(upload_path)
     return filename, upload_path
 
+def copy_local_file(source_path):
+    filename = shard_path(f"{uuid.uuid4().hex}_{os.path.basename(source_path)}")
+    upload_path = _prepare_path(UPLOAD_FOLDER, filename)
+    shutil.copyfile(source_path, upload_path)
+    return filename, upload_path
+
+def result_name(filename):
+    return f"result_{os.path.basename(filename)}"
+
 def save_result_image(image_array, filename):
-    result_filename = f"result_{filename}"
-    result_path = os.path.join(RESULT_FOLDER, result_filename)
+    result_filename = shard_path(result_name(filename))
+    result_path = _prepare_path(RESULT_FOLDER, result_filename)
     
     result_pil = Image.fromarray(image_array)
     result_pil.save(result_path)
     
-    return result_filename, result_path
\ No newline at end of file
+    return result_filename, result_path
@@ -1,9 +1,36 @@
 import json
 import os
+import threading
+import uuid
+from contextlib import contextmanager
 import numpy as np
 from datetime import datetime
 from config import HISTORY_FILE
 
+try:
+    import fcntl
+except ImportError:  # Windows: блокировка только внутри процесса
+    fcntl = None
+
+HISTORY_LOCK_FILE = str(HISTORY_FILE) + '.lock'
+
+_history_lock = threading.Lock()
+
+@contextmanager
+def history_lock():
+    """Блокировка чтения-изменения-записи истории между потоками и процессами
+    (сервер, ingest.py, очистка хранилища)"""
+    with _history_lock:
+        if fcntl is None:
+            yield
+            return
+        with open(HISTORY_LOCK_FILE, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
 def load_history():
     if not os.path.exists(HISTORY_FILE):
         with open(HISTORY_FILE, 'w', encoding='utf-8') as f:
@@ -30,25 +57,82 @@ def load_history():
         print(f"❌ Неожиданная ошибка: {e}")
         return []
 
+def _json_default(obj):
+    if isinstance(obj, np.integer):
+        return int(obj)
+    elif isinstance(obj, np.floating):
+        return float(obj)
+    elif isinstance(obj, np.ndarray):
+        return obj.tolist()
+    elif isinstance(obj, datetime):
+        return obj.isoformat()
+    elif isinstance(obj, np.bool_):
+        return bool(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def iter_history(chunk_size=64 * 1024):
+    """Поэлементное чтение history.json без загрузки всего списка в память"""
+    if not os.path.exists(HISTORY_FILE):
+        return
+
+    decoder = json.JSONDecoder()
+    with open(HISTORY_FILE, 'r', encoding='utf-8') as f:
+        buffer = ''
+        pos = 0
+        eof = False
+        started = False
+
+        while True:
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                pos += 1
+
+            if pos >= len(buffer):
+                if eof:
+                    return
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buffer, pos = chunk, 0
+                continue
+
+            if buffer[pos] == '[' and not started:
+                started = True
+                pos += 1
+                continue
+            if buffer[pos] == ']':
+                return
+
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError as e:
+                if eof:
+                    print(f"⚠️ Ошибка чтения history.json: {e}")
+                    return
+                # Элемент не поместился в буфер — дочитываем файл
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buffer, pos = buffer[pos:] + chunk, 0
+                continue
+
+            yield item
+            pos = end
+
+def iter_history_ndjson():
+    for item in iter_history():
+        yield json.dumps(item, ensure_ascii=False, default=_json_default) + '\n'
+
+def iter_history_json_array():
+    yield '['
+    for index, item in enumerate(iter_history()):
+        prefix = ',' if index else ''
+        yield prefix + json.dumps(item, ensure_ascii=False, separators=(',', ':'), default=_json_default)
+    yield ']'
+
 def save_history(history):
     try:
         temp_file = str(HISTORY_FILE) + '.tmp'
         
-        def numpy_serializer(obj):
-            if isinstance(obj, np.integer):
-                return int(obj)
-            elif isinstance(obj, np.floating):
-                return float(obj)
-            elif isinstance(obj, np.ndarray):
-                return obj.tolist()
-            elif isinstance(obj, datetime):
-                return obj.isoformat()
-            elif isinstance(obj, np.bool_):
-                return bool(obj)
-            raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
-        
         with open(temp_file, 'w', encoding='utf-8') as f:
-            json.dump(history, f, ensure_ascii=False, indent=2, default=numpy_serializer)
+            json.dump(history, f, ensure_ascii=False, indent=2, default=_json_default)
         
         if os.path.exists(HISTORY_FILE):
             os.replace(temp_file, HISTORY_FILE)
@@ -62,64 +146,65 @@ def save_history(history):
         if 'temp_file' in locals() and os.path.exists(temp_file):
             os.remove(temp_file)
 
-def calculate_summary_statistics(history_data):
-    if not history_data:
-        return {
-            'total_requests': 0,
-            'total_bears': 0,
-            'avg_confidence': 0,
-            'max_confidence': 0,
-            'min_confidence': 0,
-            'bears_per_request': 0,
-            'daily_stats': []
-        }
-    
-    total_requests = len(history_data)
-    total_bears = sum(item['bear_count'] for item in history_data)
-    
-    all_confidences = []
-    for item in history_data:
-        for det in item['detections']:
-            all_confidences.append(det['confidence'])
-    
-    avg_confidence = np.mean(all_confidences) if all_confidences else 0
-    max_confidence = max(all_confidences) if all_confidences else 0
-    min_confidence = min(all_confidences) if all_confidences else 0
-    
-    daily_stats = {}
-    for item in history_data:
-        date = item['timestamp'][:10]  # YYYY-MM-DD
-        if date not in daily_stats:
-            daily_stats[date] = {
-                'count': 0, 
-                'bears': 0,
-                'confidences': []
-            }
-        
-        daily_stats[date]['count'] += 1
-        daily_stats[date]['bears'] += item['bear_count']
-        for det in item['detections']:
-            daily_stats[date]['confidences'].append(det['confidence'])
-    
-    formatted_daily_stats = []
-    for date, stats in sorted(daily_stats.items(), reverse=True):
-        avg_conf = np.mean(stats['confidences']) if stats['confidences'] else 0
-        max_conf = max(stats['confidences']) if stats['confidences'] else 0
-        
-        formatted_daily_stats.append({
-            'date': date,
-            'count': stats['count'],
-            'bears': stats['bears'],
-            'avg_confidence': avg_conf,
-            'max_confidence': max_conf
+def append_history(entries):
+    """Дописывает записи; возвращает версии истории до и после записи"""
+    with history_lock():
+        version_before = history_version()
+        history = load_history()
+        history.extend(entries)
+        save_history(history)
+        return version_before, history_version()
+
+def update_history_paths(path_mapping, keys=('original_image', 'result_image')):
+    """Замена путей к файлам в истории; None в отображении — файл удален"""
+    with history_lock():
+        history = load_history()
+        updated = 0
+        for item in history:
+            for key in keys:
+                if item.get(key) in path_mapping:
+                    item[key] = path_mapping[item[key]]
+                    updated += 1
+        if updated:
+            save_history(history)
+    return updated
+
+def build_history_entry(filename, detections, processing_time, result_image, lazy_render=False):
+    detailed_detections = []
+    for det in detections:
+        detailed_detections.append({
+            'bbox': [float(x) for x in det['bbox']],
+            'confidence': float(det['confidence']),
+            'class': det['class'],
+            'class_id': int(det['class_id']),
+            'area': float(det.get('area', 0)),
+            'center_x': float(det.get('center_x', 0)),
+            'center_y': float(det.get('center_y', 0))
         })
-    
-    return {
-        'total_requests': total_requests,
-        'total_bears': total_bears,
-        'avg_confidence': avg_confidence,
-        'max_confidence': max_confidence,
-        'min_confidence': min_confidence,
-        'bears_per_request': total_bears / total_requests if total_requests > 0 else 0,
-        'daily_stats': formatted_daily_stats[:10]
-    }
\ No newline at end of file
+
+    history_entry = {
+        'id': str(uuid.uuid4()),
+        'timestamp': datetime.now().isoformat(),
+        'original_image': f'static/uploads/{filename}',
+        'result_image': result_image,
+        'detections': detailed_detections,
+        'bear_count': int(len(detections)),
+        'processing_time': float(processing_time)
+    }
+    if lazy_render:
+        history_entry['lazy_render'] = True
+
+    return history_entry
+
+def calculate_summary_statistics(history_data):
+    from utils.history_table import build_history_frames, summarize_frames
+
+    requests_df, detections_df = build_history_frames(history_data)
+    return summarize_frames(requests_df, detections_df)
+
+def history_version():
+    """Идентификатор текущего состояния history.json для кэшей"""
+    if not os.path.exists(HISTORY_FILE):
+        return 'empty'
+    stat = os.stat(HISTORY_FILE)
+    return f'{stat.st_mtime_ns:x}_{stat.st_size:x}'
@@ -0,0 +1,197 @@
+import os
+import tempfile
+import threading
+
+import pandas as pd
+
+from config import HISTORY_TABLE_FOLDER
+from utils.history_manager import iter_history, history_version
+
+REQUESTS_TABLE = os.path.join(HISTORY_TABLE_FOLDER, 'requests.parquet')
+DETECTIONS_TABLE = os.path.join(HISTORY_TABLE_FOLDER, 'detections.parquet')
+# Версия history.json, по которой построены таблицы
+VERSION_FILE = os.path.join(HISTORY_TABLE_FOLDER, 'version.txt')
+# /stats, отчеты и SSE могут пересобирать таблицы одновременно в разных потоках
+_tables_lock = threading.Lock()
+
+
+def build_history_frames(history_data):
+    """Таблица запросов и плоская таблица детекций (по строке на медведя)"""
+    requests = {
+        'id': [], 'timestamp': [], 'date': [], 'bear_count': [], 'processing_time': [],
+        'original_image': [], 'result_image': [], 'source': [], 'burst_id': []
+    }
+    detections = {
+        'request_id': [], 'date': [], 'confidence': [],
+        'x1': [], 'y1': [], 'x2': [], 'y2': [], 'area': []
+    }
+
+    for item in history_data:
+        date = item['timestamp'][:10]  # YYYY-MM-DD
+        requests['id'].append(item['id'])
+        requests['timestamp'].append(item['timestamp'])
+        requests['date'].append(date)
+        requests['bear_count'].append(item['bear_count'])
+        requests['processing_time'].append(item.get('processing_time', 0.0))
+        requests['original_image'].append(item.get('original_image'))
+        requests['result_image'].append(item.get('result_image'))
+        requests['source'].append(item.get('source'))
+        requests['burst_id'].append(item.get('burst_id') or item['id'])
+
+        for det in item['detections']:
+            x1, y1, x2, y2 = det['bbox']
+            detections['request_id'].append(item['id'])
+            detections['date'].append(date)
+            detections['confidence'].append(det['confidence'])
+            detections['x1'].append(x1)
+            detections['y1'].append(y1)
+            detections['x2'].append(x2)
+            detections['y2'].append(y2)
+            detections['area'].append(det.get('area', (x2 - x1) * (y2 - y1)))
+
+    requests_df = pd.DataFrame(requests).astype({'bear_count': 'int64', 'processing_time': 'float64'})
+    detections_df = pd.DataFrame(detections).astype({'confidence': 'float64', 'area': 'float64'})
+    return requests_df, detections_df
+
+
+def save_history_frames(requests_df, detections_df, requests_path=REQUESTS_TABLE, detections_path=DETECTIONS_TABLE):
+    requests_df.to_parquet(requests_path, index=False)
+    detections_df.to_parquet(detections_path, index=False)
+
+
+def _read_table_version():
+    try:
+        with open(VERSION_FILE, 'r', encoding='utf-8') as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+
+
+def _temp_path(target):
+    fd, path = tempfile.mkstemp(prefix=os.path.basename(target) + '.', suffix='.tmp', dir=HISTORY_TABLE_FOLDER)
+    os.close(fd)
+    return path
+
+
+def _save_cached_frames(requests_df, detections_df, version):
+    # Пока таблицы перезаписываются, версии нет — параллельный читатель пересоберет их сам
+    if os.path.exists(VERSION_FILE):
+        os.remove(VERSION_FILE)
+
+    temp_paths = [_temp_path(REQUESTS_TABLE), _temp_path(DETECTIONS_TABLE), _temp_path(VERSION_FILE)]
+    requests_tmp, detections_tmp, version_tmp = temp_paths
+    try:
+        save_history_frames(requests_df, detections_df, requests_tmp, detections_tmp)
+        with open(version_tmp, 'w', encoding='utf-8') as f:
+            f.write(version)
+        os.replace(requests_tmp, REQUESTS_TABLE)
+        os.replace(detections_tmp, DETECTIONS_TABLE)
+        os.replace(version_tmp, VERSION_FILE)
+    finally:
+        for path in temp_paths:
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def _read_cached_frames(version):
+    if _read_table_version() != version:
+        return None
+    try:
+        return pd.read_parquet(REQUESTS_TABLE), pd.read_parquet(DETECTIONS_TABLE)
+    except Exception as e:
+        # Поврежденный или недописанный файл не должен ломать статистику — пересобираем
+        print(f"⚠️ Не удалось прочитать таблицы истории, пересборка: {e}")
+        return None
+
+
+def load_history_frames_versioned():
+    """Таблицы истории и версия history.json, по которой они построены.
+
+    Версия берется до чтения истории: если запись произошла во время сборки,
+    сохраненные таблицы получат старую версию и при следующем вызове пересоберутся.
+    """
+    with _tables_lock:
+        version = history_version()
+        cached = _read_cached_frames(version)
+        if cached is not None:
+            return cached[0], cached[1], version
+
+        requests_df, detections_df = build_history_frames(iter_history())
+        try:
+            _save_cached_frames(requests_df, detections_df, version)
+        except ImportError as e:
+            print(f"⚠️ Parquet недоступен, таблицы истории не сохранены: {e}")
+        except OSError as e:
+            print(f"⚠️ Не удалось сохранить таблицы истории: {e}")
+
+    return requests_df, detections_df, version
+
+
+def load_history_frames():
+    requests_df, detections_df, _ = load_history_frames_versioned()
+    return requests_df, detections_df
+
+
+def summarize_frames(requests_df, detections_df, daily_limit=10):
+    if requests_df.empty:
+        return {
+            'total_requests': 0,
+            'total_bears': 0,
+            'avg_confidence': 0,
+            'max_confidence': 0,
+            'min_confidence': 0,
+            'bears_per_request': 0,
+            'total_events': 0,
+            'event_bears': 0,
+            'daily_stats': []
+        }
+
+    total_requests = len(requests_df)
+    total_bears = int(requests_df['bear_count'].sum())
+
+    confidences = detections_df['confidence']
+    has_detections = not confidences.empty
+
+    # Событие — серия снимков с одним burst_id; медведей в событии — максимум по кадрам
+    event_bears = requests_df.groupby('burst_id')['bear_count'].max()
+
+    daily = requests_df.groupby('date').agg(
+        count=('id', 'size'),
+        bears=('bear_count', 'sum'),
+        events=('burst_id', 'nunique')
+    )
+    daily_confidence = detections_df.groupby('date')['confidence'].agg(
+        avg_confidence='mean',
+        max_confidence='max'
+    )
+    daily = daily.join(daily_confidence).fillna(0).sort_index(ascending=False).head(daily_limit)
+
+    daily_stats = [
+        {
+            'date': date,
+            'count': int(row['count']),
+            'bears': int(row['bears']),
+            'events': int(row['events']),
+            'avg_confidence': float(row['avg_confidence']),
+            'max_confidence': float(row['max_confidence'])
+        }
+        for date, row in daily.iterrows()
+    ]
+
+    return {
+        'total_requests': total_requests,
+        'total_bears': total_bears,
+        'avg_confidence': float(confidences.mean()) if has_detections else 0,
+        'max_confidence': float(confidences.max()) if has_detections else 0,
+        'min_confidence': float(confidences.min()) if has_detections else 0,
+        'bears_per_request': total_bears / total_requests,
+        'total_events': len(event_bears),
+        'event_bears': int(event_bears.sum()),
+        'daily_stats': daily_stats
+    }
+
+
+def request_confidence_stats(detections_df):
+    """Средняя, максимальная и минимальная уверенность по каждому запросу"""
+    stats = detections_df.groupby('request_id')['confidence'].agg(['mean', 'max', 'min'])
+    return stats.to_dict('index')
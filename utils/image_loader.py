@@ -0,0 +1,48 @@
+import math
+
+import numpy as np
+from PIL import Image
+
+
+def load_image(image_path, target_size=None):
+    """Загрузка изображения в RGB.
+
+    Если задан target_size, JPEG декодируется с понижением масштаба в DCT-области
+    (Image.draft) до наименьшего размера, у которого длинная сторона не меньше
+    target_size. Возвращает массив и коэффициенты (scale_x, scale_y) для
+    пересчета координат обратно в исходное изображение.
+    """
+    image = Image.open(image_path)
+    original_width, original_height = image.size
+
+    if target_size and max(original_width, original_height) > target_size:
+        ratio = target_size / max(original_width, original_height)
+        image.draft('RGB', (
+            math.ceil(original_width * ratio),
+            math.ceil(original_height * ratio)
+        ))
+
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+
+    image_np = np.array(image)
+    height, width = image_np.shape[:2]
+
+    return image_np, (original_width / width, original_height / height)
+
+
+def scale_detection(detection, scale):
+    scale_x, scale_y = scale
+    if scale_x == 1 and scale_y == 1:
+        return detection
+
+    x1, y1, x2, y2 = detection['bbox']
+    x1, x2 = x1 * scale_x, x2 * scale_x
+    y1, y2 = y1 * scale_y, y2 * scale_y
+
+    detection = dict(detection)
+    detection['bbox'] = [float(x1), float(y1), float(x2), float(y2)]
+    detection['area'] = float((x2 - x1) * (y2 - y1))
+    detection['center_x'] = float((x1 + x2) / 2)
+    detection['center_y'] = float((y1 + y2) / 2)
+    return detection
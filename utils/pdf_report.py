@@ -0,0 +1,255 @@
+import glob
+import os
+import tempfile
+from datetime import datetime
+
+from PIL import Image, ImageDraw, ImageFont
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+from reportlab.platypus import Table, TableStyle
+
+from config import RESULT_FOLDER, REPORT_CACHE_FOLDER, PDF_FONT_PATH, PDF_ROWS_PER_PAGE
+from utils.excel_reporter import register_pdf_fonts
+from utils.history_manager import iter_history, history_version
+from utils.history_table import load_history_frames, summarize_frames
+
+PAGE_WIDTH, PAGE_HEIGHT = A4
+MARGIN = 40
+CHART_SIZE = (1600, 560)
+
+TABLE_HEADER = ['№', 'Дата и время', 'Медведей', 'Ср. уверенность', 'Время обработки', 'Файл']
+TABLE_COLUMN_WIDTHS = [40, 110, 55, 80, 85, 145]
+TABLE_STYLE = TableStyle([
+    ('FONT', (0, 0), (-1, -1), 'DejaVu', 8),
+    ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+    ('ALIGN', (2, 1), (4, -1), 'CENTER')
+])
+
+
+def daily_frame(requests_df, detections_df):
+    daily = requests_df.groupby('date').agg(
+        count=('id', 'size'),
+        bears=('bear_count', 'sum')
+    )
+    confidence = detections_df.groupby('date')['confidence'].mean().rename('avg_confidence')
+    return daily.join(confidence).fillna(0).sort_index()
+
+
+def render_daily_chart(path, dates, values, title, color, value_format, bars=True):
+    image = Image.new('RGB', CHART_SIZE, 'white')
+    draw = ImageDraw.Draw(image)
+    font = ImageFont.truetype(str(PDF_FONT_PATH), 22)
+    title_font = ImageFont.truetype(str(PDF_FONT_PATH), 30)
+
+    left, top, right, bottom = 110, 70, CHART_SIZE[0] - 30, CHART_SIZE[1] - 70
+    draw.text((left, 20), title, fill='black', font=title_font)
+    draw.line([(left, top), (left, bottom), (right, bottom)], fill='black', width=2)
+
+    max_value = max(max(values, default=0), 1e-9)
+    for step in range(5):
+        value = max_value * step / 4
+        y = bottom - (bottom - top) * step / 4
+        draw.line([(left - 6, y), (right, y)], fill=(225, 225, 225))
+        draw.text((10, y - 12), value_format(value), fill='black', font=font)
+
+    count = len(values)
+    slot = (right - left) / max(count, 1)
+    points = []
+    for index, value in enumerate(values):
+        x = left + slot * (index + 0.5)
+        y = bottom - (bottom - top) * value / max_value
+        if bars:
+            half = max(slot * 0.35, 0.5)
+            draw.rectangle([x - half, y, x + half, bottom], fill=color)
+        points.append((x, y))
+
+    if not bars and points:
+        draw.line(points, fill=color, width=3)
+        for x, y in points:
+            draw.ellipse([x - 4, y - 4, x + 4, y + 4], fill=color)
+
+    # Подписи дат: не больше 10, чтобы не налезали друг на друга
+    label_step = max(1, (count + 9) // 10)
+    for index in range(0, count, label_step):
+        x = left + slot * (index + 0.5)
+        draw.text((x - 60, bottom + 12), dates[index], fill='black', font=font)
+
+    image.save(path, optimize=True)
+
+
+# Сколько последних версий графиков хранить: отчет, начатый до новой загрузки,
+# еще читает графики предыдущей версии
+CHART_VERSIONS_KEPT = 2
+
+
+def _render_chart_atomic(path, *args, **kwargs):
+    # Параллельный отчет той же версии не должен увидеть недописанный PNG
+    fd, temp_path = tempfile.mkstemp(prefix='.tmp_', suffix='.png', dir=os.path.dirname(path))
+    os.close(fd)
+    try:
+        render_daily_chart(temp_path, *args, **kwargs)
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def _prune_chart_versions(cache_folder, version):
+    """Удаляет графики всех версий, кроме текущей и последних предшествующих"""
+    versions = {}
+    for path in glob.glob(os.path.join(cache_folder, 'daily_*.png')):
+        # daily_<вид>_<версия>.png
+        chart_version = os.path.basename(path)[:-len('.png')].split('_', 2)[-1]
+        try:
+            mtime = os.path.getmtime(path)
+        except FileNotFoundError:
+            continue
+        paths, newest = versions.get(chart_version, ([], 0))
+        versions[chart_version] = (paths + [path], max(newest, mtime))
+
+    others = sorted((v for v in versions if v != version), key=lambda v: versions[v][1], reverse=True)
+    for old_version in others[CHART_VERSIONS_KEPT - 1:]:
+        for path in versions[old_version][0]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def get_daily_charts(daily, version, cache_folder=REPORT_CACHE_FOLDER):
+    """Графики по дням; перерисовываются только при новой версии истории"""
+    bears_path = os.path.join(cache_folder, f'daily_bears_{version}.png')
+    confidence_path = os.path.join(cache_folder, f'daily_confidence_{version}.png')
+    if os.path.exists(bears_path) and os.path.exists(confidence_path):
+        return bears_path, confidence_path
+
+    dates = list(daily.index)
+    _render_chart_atomic(
+        bears_path, dates, daily['bears'].tolist(),
+        "Обнаружено медведей по дням", (54, 96, 146), lambda v: f"{v:.0f}"
+    )
+    _render_chart_atomic(
+        confidence_path, dates, daily['avg_confidence'].tolist(),
+        "Средняя уверенность по дням", (46, 139, 87), lambda v: f"{v:.0%}", bars=False
+    )
+    _prune_chart_versions(cache_folder, version)
+    return bears_path, confidence_path
+
+    for old_path in glob.glob(os.path.join(cache_folder, 'daily_*.png')):
+        if not old_path.endswith(f'_{version}.png'):
+            os.remove(old_path)
+
+    dates = list(daily.index)
+    render_daily_chart(
+        bears_path, dates, daily['bears'].tolist(),
+        "Обнаружено медведей по дням", (54, 96, 146), lambda v: f"{v:.0f}"
+    )
+    render_daily_chart(
+        confidence_path, dates, daily['avg_confidence'].tolist(),
+        "Средняя уверенность по дням", (46, 139, 87), lambda v: f"{v:.0%}", bars=False
+    )
+    return bears_path, confidence_path
+
+
+def _draw_footer(pdf, page_number):
+    pdf.setFont('DejaVu', 8)
+    pdf.drawRightString(PAGE_WIDTH - MARGIN, MARGIN / 2, f"Стр. {page_number}")
+
+
+def _draw_summary_page(pdf, summary, chart_paths):
+    y = PAGE_HEIGHT - MARGIN - 10
+    pdf.setFont('DejaVu', 16)
+    pdf.drawCentredString(PAGE_WIDTH / 2, y, "Отчёт по детекции медведей")
+
+    lines = [
+        f"Дата генерации: {datetime.now().strftime('%d.%m.%Y %H:%M:%S')}",
+        f"Всего запросов: {summary['total_requests']}",
+        f"Всего обнаружено медведей: {summary['total_bears']}",
+        f"Событий (серий снимков): {summary['total_events']}",
+        f"Средняя уверенность: {summary['avg_confidence']:.1%}"
+    ]
+    pdf.setFont('DejaVu', 10)
+    y -= 30
+    for line in lines:
+        pdf.drawString(MARGIN, y, line)
+        y -= 16
+
+    chart_width = PAGE_WIDTH - 2 * MARGIN
+    chart_height = chart_width * CHART_SIZE[1] / CHART_SIZE[0]
+    for chart_path in chart_paths:
+        y -= chart_height + 15
+        pdf.drawImage(chart_path, MARGIN, y, width=chart_width, height=chart_height)
+
+    _draw_footer(pdf, 1)
+    pdf.showPage()
+
+
+def _table_row(index, item):
+    confidences = [det['confidence'] for det in item['detections']]
+    avg_confidence = sum(confidences) / len(confidences) if confidences else 0
+    filename = os.path.basename(item.get('original_image') or '')
+
+    return [
+        str(index),
+        item['timestamp'][:19].replace('T', ' '),
+        str(item['bear_count']),
+        f"{avg_confidence:.1%}" if confidences else '—',
+        f"{item.get('processing_time', 0):.2f} сек",
+        filename if len(filename) <= 32 else filename[:29] + '...'
+    ]
+
+
+def _draw_table_page(pdf, rows, page_number):
+    table = Table([TABLE_HEADER] + rows, colWidths=TABLE_COLUMN_WIDTHS)
+    table.setStyle(TABLE_STYLE)
+    _, table_height = table.wrapOn(pdf, PAGE_WIDTH - 2 * MARGIN, PAGE_HEIGHT - 2 * MARGIN)
+    table.drawOn(pdf, MARGIN, PAGE_HEIGHT - MARGIN - table_height)
+    _draw_footer(pdf, page_number)
+    pdf.showPage()
+
+
+def generate_full_pdf_report(entries=None, requests_df=None, detections_df=None, version=None,
+                             rows_per_page=PDF_ROWS_PER_PAGE, output_folder=RESULT_FOLDER,
+                             cache_folder=REPORT_CACHE_FOLDER):
+    """PDF по всей истории.
+
+    Таблица строится постранично по rows_per_page строк прямо на холсте, поэтому
+    в памяти одновременно находится только одна страница таблицы, а не список
+    flowables на всю историю.
+    """
+    register_pdf_fonts()
+
+    if requests_df is None or detections_df is None:
+        requests_df, detections_df = load_history_frames()
+    if version is None:
+        version = history_version()
+    if entries is None:
+        entries = iter_history()
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    path = os.path.join(output_folder, f"bear_detection_full_report_{timestamp}.pdf")
+
+    pdf = canvas.Canvas(path, pagesize=A4, pageCompression=1)
+    pdf.setTitle("Отчёт по детекции медведей")
+
+    summary = summarize_frames(requests_df, detections_df)
+    chart_paths = get_daily_charts(daily_frame(requests_df, detections_df), version, cache_folder)
+    _draw_summary_page(pdf, summary, chart_paths)
+
+    page_number = 2
+    rows = []
+    for index, item in enumerate(entries, 1):
+        rows.append(_table_row(index, item))
+        if len(rows) == rows_per_page:
+            _draw_table_page(pdf, rows, page_number)
+            rows = []
+            page_number += 1
+    if rows:
+        _draw_table_page(pdf, rows, page_number)
+
+    pdf.save()
+
+    print(f"✅ Полный PDF отчет создан: {path}")
+    return path
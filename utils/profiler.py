@@ -0,0 +1,84 @@
+import cProfile
+import functools
+import os
+import pstats
+import uuid
+from datetime import datetime
+
+from flask import request
+
+from config import PROFILING_ENABLED, PROFILE_FOLDER, PROFILE_MAX_FILES
+
+
+def _profiling_requested():
+    return request.headers.get('X-Profile') == '1' or request.args.get('profile') == '1'
+
+
+def _cleanup_profiles():
+    profiles = sorted(
+        (os.path.join(PROFILE_FOLDER, name) for name in os.listdir(PROFILE_FOLDER) if name.endswith('.prof')),
+        key=os.path.getmtime
+    )
+    for path in profiles[:-PROFILE_MAX_FILES]:
+        os.remove(path)
+
+
+def profiled(name):
+    """Профилирование обработчика по запросу клиента.
+
+    Если PROFILING_ENABLED выключен, функция возвращается без обертки.
+    """
+    def decorator(func):
+        if not PROFILING_ENABLED:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _profiling_requested():
+                return func(*args, **kwargs)
+
+            profiler = cProfile.Profile()
+            try:
+                return profiler.runcall(func, *args, **kwargs)
+            finally:
+                os.makedirs(PROFILE_FOLDER, exist_ok=True)
+                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                profile_path = os.path.join(PROFILE_FOLDER, f"{name}_{timestamp}_{uuid.uuid4().hex[:8]}.prof")
+                profiler.dump_stats(profile_path)
+                _cleanup_profiles()
+                print(f"📊 Профиль запроса сохранен: {profile_path}")
+
+        return wrapper
+    return decorator
+
+
+def list_profiles(limit=20, top=5):
+    if not os.path.isdir(PROFILE_FOLDER):
+        return []
+
+    paths = sorted(
+        (os.path.join(PROFILE_FOLDER, name) for name in os.listdir(PROFILE_FOLDER) if name.endswith('.prof')),
+        key=os.path.getmtime,
+        reverse=True
+    )[:limit]
+
+    profiles = []
+    for path in paths:
+        stats = pstats.Stats(path)
+        # Горячие точки — функции с наибольшим собственным временем
+        hotspots = sorted(stats.stats.items(), key=lambda item: item[1][2], reverse=True)[:top]
+        profiles.append({
+            'file': os.path.basename(path),
+            'created': datetime.fromtimestamp(os.path.getmtime(path)).isoformat(),
+            'total_time': stats.total_tt,
+            'hotspots': [
+                {
+                    'function': f"{filename}:{line}({function})",
+                    'calls': calls,
+                    'self_time': self_time,
+                    'cumulative_time': cumulative_time
+                }
+                for (filename, line, function), (_, calls, self_time, cumulative_time, _) in hotspots
+            ]
+        })
+    return profiles
@@ -0,0 +1,139 @@
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image
+
+from config import BASE_DIR, RESULT_CACHE_FOLDER, RESULT_CACHE_MAX_BYTES
+from utils.history_manager import history_version
+from utils.history_table import load_history_frames_versioned
+from utils.visualization import render_result_image
+
+RESULT_CACHE_URL_PREFIX = 'static/results/cache'
+
+_cache_lock = threading.Lock()
+_cache_index = None  # имя файла -> размер, от давно использованных к недавним
+
+_entry_lock = threading.Lock()
+_entry_index = None  # индекс таблиц истории по result_image для текущей версии истории
+
+
+def cached_result_url(result_filename):
+    return f'{RESULT_CACHE_URL_PREFIX}/{result_filename}'
+
+
+def _get_cache_index():
+    global _cache_index
+    if _cache_index is None:
+        # Восстанавливаем порядок LRU по времени последнего обращения к файлам
+        files = []
+        for name in os.listdir(RESULT_CACHE_FOLDER):
+            path = os.path.join(RESULT_CACHE_FOLDER, name)
+            if name.startswith('.') or not os.path.isfile(path):
+                continue
+            stat = os.stat(path)
+            files.append((stat.st_mtime, name, stat.st_size))
+        _cache_index = OrderedDict((name, size) for _, name, size in sorted(files))
+    return _cache_index
+
+
+def _evict(index):
+    total = sum(index.values())
+    while total > RESULT_CACHE_MAX_BYTES and len(index) > 1:
+        name, size = index.popitem(last=False)
+        try:
+            os.remove(os.path.join(RESULT_CACHE_FOLDER, name))
+        except FileNotFoundError:
+            pass
+        total -= size
+
+
+def _get_entry_index():
+    global _entry_index
+    version = history_version()
+    if _entry_index is None or _entry_index['version'] != version:
+        # Таблицы истории берутся из кэша Parquet: history.json не разбирается на каждый промах
+        requests_df, detections_df, version = load_history_frames_versioned()
+        requests_df = requests_df.dropna(subset=['result_image']).drop_duplicates('result_image', keep='last')
+        _entry_index = {
+            'version': version,
+            'requests': requests_df.set_index('result_image'),
+            'detections': detections_df,
+            'positions': detections_df.groupby('request_id').indices
+        }
+    return _entry_index
+
+
+def find_result_entry(result_url):
+    """Запись истории с полями, нужными для отрисовки, или None"""
+    with _entry_lock:
+        index = _get_entry_index()
+    if result_url not in index['requests'].index:
+        return None
+
+    row = index['requests'].loc[result_url]
+    rows = index['detections'].iloc[index['positions'].get(row['id'], [])]
+    original_image = row['original_image']
+    return {
+        'original_image': original_image if isinstance(original_image, str) else None,
+        'processing_time': float(row['processing_time']),
+        'detections': [
+            {'bbox': [r.x1, r.y1, r.x2, r.y2], 'confidence': float(r.confidence), 'area': float(r.area)}
+            for r in rows.itertuples()
+        ]
+    }
+
+
+def render_history_entry(entry):
+    # Оригинал мог быть удален очисткой хранилища
+    if not entry.get('original_image'):
+        return None
+    original_path = os.path.join(BASE_DIR, entry['original_image'])
+    if not os.path.exists(original_path):
+        return None
+
+    image = Image.open(original_path)
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+
+    return render_result_image(
+        np.array(image),
+        entry['detections'],
+        entry.get('processing_time')
+    )
+
+
+def get_cached_result(result_filename):
+    """Путь к размеченному изображению; рисует его при первом запросе"""
+    result_filename = os.path.basename(result_filename)
+    result_path = os.path.join(RESULT_CACHE_FOLDER, result_filename)
+
+    with _cache_lock:
+        index = _get_cache_index()
+        if result_filename in index and os.path.exists(result_path):
+            index.move_to_end(result_filename)
+            os.utime(result_path)
+            return result_path
+
+    entry = find_result_entry(cached_result_url(result_filename))
+    if entry is None:
+        return None
+
+    result_img = render_history_entry(entry)
+    if result_img is None:
+        return None
+
+    # Пишем во временный файл, чтобы параллельный запрос не отдал недописанный
+    name, ext = os.path.splitext(result_filename)
+    temp_path = os.path.join(RESULT_CACHE_FOLDER, f'.{name}.{threading.get_ident()}{ext}')
+    Image.fromarray(result_img).save(temp_path)
+    os.replace(temp_path, result_path)
+
+    with _cache_lock:
+        index = _get_cache_index()
+        index[result_filename] = os.path.getsize(result_path)
+        index.move_to_end(result_filename)
+        _evict(index)
+
+    return result_path
@@ -0,0 +1,175 @@
+"""Очистка хранилища загрузок и результатов.
+
+Пример:
+    python -m utils.retention
+"""
+import os
+import threading
+import time
+from datetime import datetime
+
+from PIL import Image
+
+from config import (BASE_DIR, UPLOAD_FOLDER, RESULT_FOLDER, RESULT_CACHE_FOLDER, PARTIAL_UPLOAD_FOLDER, RETENTION_POLICIES,
+                    RECOMPRESS_FORMAT, RECOMPRESS_QUALITY, SHARD_BY_DATE)
+from utils.file_handler import shard_path
+from utils.history_manager import update_history_paths
+from utils.stream_upload import cleanup_stale_uploads
+
+FOLDERS = {
+    'uploads': UPLOAD_FOLDER,
+    'results': RESULT_FOLDER
+}
+
+RECOMPRESSIBLE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+RECOMPRESSED_MARKER = '.rc'
+RECOMPRESS_EXTENSIONS = {'JPEG': '.jpg', 'WEBP': '.webp'}
+
+# Свежие файлы (например, только что созданный отчет) не переносятся
+SHARD_GRACE_SECONDS = 300
+
+# Кэш ленивой отрисовки ограничивается собственным LRU, недокачанные файлы не трогаем
+EXCLUDED_DIRS = {os.path.abspath(RESULT_CACHE_FOLDER), os.path.abspath(PARTIAL_UPLOAD_FOLDER)}
+
+
+def _history_path(path):
+    return os.path.relpath(path, BASE_DIR).replace(os.sep, '/')
+
+
+def _list_files(folder):
+    files = []
+    for dirpath, dirnames, filenames in os.walk(folder):
+        dirnames[:] = [d for d in dirnames if os.path.abspath(os.path.join(dirpath, d)) not in EXCLUDED_DIRS]
+        for name in filenames:
+            if name.startswith('.') or name.endswith('.tmp'):
+                continue
+            path = os.path.join(dirpath, name)
+            stat = os.stat(path)
+            files.append({'path': path, 'size': stat.st_size, 'mtime': stat.st_mtime})
+    return files
+
+
+def _shard_flat_files(folder, files, mapping, report, now):
+    # Файлы из корня папки переносятся в подпапки по дате изменения
+    for file in files:
+        if os.path.dirname(file['path']) != str(folder) or now - file['mtime'] < SHARD_GRACE_SECONDS:
+            continue
+        name = os.path.basename(file['path'])
+        new_path = os.path.join(folder, shard_path(name, datetime.fromtimestamp(file['mtime'])))
+        os.makedirs(os.path.dirname(new_path), exist_ok=True)
+        os.replace(file['path'], new_path)
+        mapping[_history_path(file['path'])] = _history_path(new_path)
+        file['path'] = new_path
+        report['moved'] += 1
+
+
+def _recompress_old(files, max_age_days, mapping, report, now):
+    extension = RECOMPRESS_EXTENSIONS[RECOMPRESS_FORMAT]
+    for file in files:
+        stem, ext = os.path.splitext(file['path'])
+        if (now - file['mtime'] < max_age_days * 86400
+                or ext.lower() not in RECOMPRESSIBLE_EXTENSIONS
+                or stem.endswith(RECOMPRESSED_MARKER)):
+            continue
+
+        new_path = stem + RECOMPRESSED_MARKER + extension
+        try:
+            with Image.open(file['path']) as image:
+                image.convert('RGB').save(new_path, RECOMPRESS_FORMAT, quality=RECOMPRESS_QUALITY)
+        except OSError as e:
+            print(f"⚠️ Не удалось пережать {file['path']}: {e}")
+            continue
+
+        new_size = os.path.getsize(new_path)
+        if new_size >= file['size']:
+            os.remove(new_path)
+            continue
+
+        os.utime(new_path, (file['mtime'], file['mtime']))
+        os.remove(file['path'])
+        mapping[_history_path(file['path'])] = _history_path(new_path)
+        report['reclaimed_bytes'] += file['size'] - new_size
+        report['recompressed'] += 1
+        file.update({'path': new_path, 'size': new_size})
+
+
+def _delete_over_budget(files, policy, mapping, report, now):
+    max_age = policy.get('max_age_days')
+    max_bytes = policy.get('max_bytes')
+
+    files.sort(key=lambda f: f['mtime'])
+    total = sum(f['size'] for f in files)
+    kept = []
+    for file in files:
+        expired = max_age is not None and now - file['mtime'] > max_age * 86400
+        over_budget = max_bytes is not None and total > max_bytes
+        if not (expired or over_budget):
+            kept.append(file)
+            continue
+
+        try:
+            os.remove(file['path'])
+        except FileNotFoundError:
+            pass
+        total -= file['size']
+        mapping[_history_path(file['path'])] = None
+        report['reclaimed_bytes'] += file['size']
+        report['deleted'] += 1
+
+    return kept
+
+
+def sweep(policies=RETENTION_POLICIES):
+    start_time = time.time()
+    now = time.time()
+    mapping = {}
+    report = {'reclaimed_bytes': 0, 'moved': 0, 'recompressed': 0, 'deleted': 0}
+
+    for name, policy in policies.items():
+        folder = FOLDERS[name]
+        files = _list_files(folder)
+
+        if SHARD_BY_DATE:
+            _shard_flat_files(folder, files, mapping, report, now)
+        if policy.get('recompress_after_days') is not None:
+            _recompress_old(files, policy['recompress_after_days'], mapping, report, now)
+        _delete_over_budget(files, policy, mapping, report, now)
+
+    # Брошенные загрузки по частям в общий бюджет не входят и удаляются по возрасту
+    report['stale_uploads'], stale_bytes = cleanup_stale_uploads()
+    report['reclaimed_bytes'] += stale_bytes
+
+    # Пути могли смениться несколько раз за проход: перенос, затем пережатие или удаление
+    resolved = {}
+    for old_path in mapping:
+        new_path = mapping[old_path]
+        while new_path is not None and new_path in mapping:
+            new_path = mapping[new_path]
+        resolved[old_path] = new_path
+
+    report['history_updated'] = update_history_paths(resolved) if resolved else 0
+    report['duration'] = time.time() - start_time
+
+    print(f"🧹 Очистка хранилища: освобождено {report['reclaimed_bytes'] / 1024 / 1024:.1f} МБ "
+          f"за {report['duration']:.2f} с (перенесено {report['moved']}, "
+          f"пережато {report['recompressed']}, удалено {report['deleted']}, "
+          f"брошенных загрузок {report['stale_uploads']})")
+    return report
+
+
+def start_retention_worker(interval):
+    def run():
+        while True:
+            try:
+                sweep()
+            except Exception as e:
+                print(f"❌ Ошибка очистки хранилища: {e}")
+            time.sleep(interval)
+
+    thread = threading.Thread(target=run, name='retention-sweep', daemon=True)
+    thread.start()
+    return thread
+
+
+if __name__ == '__main__':
+    sweep()
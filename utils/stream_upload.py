@@ -0,0 +1,266 @@
+import hashlib
+import json
+import os
+import re
+import time
+import uuid
+from contextlib import contextmanager
+
+from werkzeug.wsgi import get_input_stream
+
+from config import (UPLOAD_FOLDER, PARTIAL_UPLOAD_FOLDER, PARTIAL_UPLOAD_MAX_AGE_HOURS, STREAM_UPLOAD_MAX_BYTES,
+                    UPLOAD_CHUNK_SIZE)
+from utils.file_handler import shard_path
+
+try:
+    import fcntl
+except ImportError:  # Windows: параллельные запросы к одной загрузке не блокируются
+    fcntl = None
+
+UPLOAD_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+CONTENT_RANGE_PATTERN = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+
+# Состояние хэша для загрузок, идущих по порядку; после перезапуска хэш досчитывается по файлу
+_hashers = {}
+
+
+class UploadError(Exception):
+    def __init__(self, message, status=400, **extra):
+        super().__init__(message)
+        self.status = status
+        self.extra = extra
+
+
+def _try_lock(f):
+    """Эксклюзивная неблокирующая блокировка файла загрузки; False — занят"""
+    if fcntl is None:
+        return True
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return False
+    return True
+
+
+@contextmanager
+def _locked_partial(upload_id):
+    # Файл открывается без создания: если загрузку уже завершили или удалили — 404
+    partial_path = os.path.join(PARTIAL_UPLOAD_FOLDER, upload_id)
+    try:
+        f = open(partial_path, 'r+b')
+    except FileNotFoundError:
+        _hashers.pop(upload_id, None)
+        raise UploadError('Unknown upload', 404)
+
+    with f:
+        if not _try_lock(f):
+            # Предыдущий запрос с этой частью еще пишет (повтор клиента по таймауту)
+            raise UploadError('Upload is busy', 409)
+        # Пока ждали, файл могли завершить и переименовать
+        if not os.path.exists(_meta_path(upload_id)):
+            raise UploadError('Unknown upload', 404)
+        f.seek(0, os.SEEK_END)
+        yield f
+
+
+def request_body_stream(environ):
+    # Лимит MAX_CONTENT_LENGTH приложения здесь не действует, поток ограничен отдельно
+    return get_input_stream(environ, max_content_length=STREAM_UPLOAD_MAX_BYTES)
+
+
+def copy_stream(stream, f, limit, hasher=None):
+    """Копирование потока в файл частями по UPLOAD_CHUNK_SIZE; не более limit байт"""
+    written = 0
+    while True:
+        chunk = stream.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            return written
+        written += len(chunk)
+        if written > limit:
+            raise UploadError('Upload exceeds declared size', 413)
+        f.write(chunk)
+        if hasher is not None:
+            hasher.update(chunk)
+
+
+def file_sha256(path):
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(UPLOAD_CHUNK_SIZE), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def _final_filename(original_name):
+    return shard_path(f"{uuid.uuid4().hex}_{os.path.basename(original_name)}")
+
+
+def _move_to_uploads(partial_path, filename):
+    # Переименование в пределах одной файловой системы, без копирования данных
+    upload_path = os.path.join(UPLOAD_FOLDER, filename)
+    os.makedirs(os.path.dirname(upload_path), exist_ok=True)
+    os.replace(partial_path, upload_path)
+    return upload_path
+
+
+def save_stream(environ, original_name):
+    """Загрузка одним запросом: тело пишется на диск с одновременным хэшированием"""
+    upload_id = uuid.uuid4().hex
+    partial_path = os.path.join(PARTIAL_UPLOAD_FOLDER, upload_id)
+    hasher = hashlib.sha256()
+
+    try:
+        with open(partial_path, 'wb') as f:
+            _try_lock(f)
+            size = copy_stream(request_body_stream(environ), f, STREAM_UPLOAD_MAX_BYTES, hasher)
+    except BaseException:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        raise
+
+    if size == 0:
+        os.remove(partial_path)
+        raise UploadError('Empty upload')
+
+    filename = _final_filename(original_name)
+    upload_path = _move_to_uploads(partial_path, filename)
+    return {'filename': filename, 'path': upload_path, 'size': size, 'sha256': hasher.hexdigest()}
+
+
+def _meta_path(upload_id):
+    if not UPLOAD_ID_PATTERN.match(upload_id):
+        raise UploadError('Unknown upload', 404)
+    return os.path.join(PARTIAL_UPLOAD_FOLDER, f'{upload_id}.json')
+
+
+def _load_meta(upload_id):
+    meta_path = _meta_path(upload_id)
+    if not os.path.exists(meta_path):
+        _hashers.pop(upload_id, None)
+        raise UploadError('Unknown upload', 404)
+    with open(meta_path, 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    meta['received'] = os.path.getsize(os.path.join(PARTIAL_UPLOAD_FOLDER, upload_id))
+    return meta
+
+
+def start_chunked_upload(original_name, size):
+    if not original_name:
+        raise UploadError('No filename')
+    try:
+        size = int(size)
+    except (TypeError, ValueError):
+        raise UploadError('Invalid upload size')
+    if size <= 0 or size > STREAM_UPLOAD_MAX_BYTES:
+        raise UploadError('Invalid upload size', 413 if size > 0 else 400)
+
+    upload_id = uuid.uuid4().hex
+    open(os.path.join(PARTIAL_UPLOAD_FOLDER, upload_id), 'wb').close()
+    with open(_meta_path(upload_id), 'w', encoding='utf-8') as f:
+        json.dump({'filename': os.path.basename(original_name), 'size': size}, f, ensure_ascii=False)
+
+    _hashers[upload_id] = hashlib.sha256()
+    return {'upload_id': upload_id, 'received': 0, 'size': size}
+
+
+def chunked_upload_status(upload_id):
+    meta = _load_meta(upload_id)
+    return {'upload_id': upload_id, 'received': meta['received'], 'size': meta['size']}
+
+
+def append_chunk(upload_id, environ, content_range):
+    """Дописывает часть, начинающуюся с уже принятого смещения (Content-Range).
+
+    Возвращает состояние загрузки; после последней части файл переносится
+    в папку загрузок и в ответе появляются filename/path/sha256.
+    """
+    meta = _load_meta(upload_id)
+    partial_path = os.path.join(PARTIAL_UPLOAD_FOLDER, upload_id)
+
+    match = CONTENT_RANGE_PATTERN.match(content_range or '')
+    if not match:
+        raise UploadError('Content-Range header required')
+    start, end, total = (int(x) for x in match.groups())
+    if total != meta['size'] or end < start or end >= total:
+        raise UploadError('Invalid Content-Range')
+
+    with _locked_partial(upload_id) as f:
+        # Смещение проверяется под блокировкой, иначе повторный запрос допишет ту же часть
+        received = f.tell()
+        if start != received:
+            # Клиент должен продолжить с принятого смещения
+            raise UploadError('Unexpected offset', 409, received=received)
+
+        hasher = _hashers.get(upload_id)
+        try:
+            written = copy_stream(request_body_stream(environ), f, end - start + 1, hasher)
+        except BaseException:
+            # Недописанная часть отбрасывается, хэш досчитается по файлу
+            f.truncate(start)
+            _hashers.pop(upload_id, None)
+            raise
+        f.flush()
+
+        received = start + written
+        if written != end - start + 1:
+            _hashers.pop(upload_id, None)
+
+    if received < meta['size']:
+        return {'upload_id': upload_id, 'received': received, 'size': meta['size'], 'complete': False}
+
+    # Файл уже полный: повторный запрос после снятия блокировки получит 409 по смещению
+    hasher = _hashers.pop(upload_id, None)
+    sha256 = hasher.hexdigest() if hasher is not None else file_sha256(partial_path)
+
+    filename = _final_filename(meta['filename'])
+    upload_path = _move_to_uploads(partial_path, filename)
+    os.remove(_meta_path(upload_id))
+
+    return {
+        'upload_id': upload_id,
+        'received': received,
+        'size': meta['size'],
+        'complete': True,
+        'filename': filename,
+        'path': upload_path,
+        'sha256': sha256
+    }
+
+
+def cleanup_stale_uploads(max_age_seconds=PARTIAL_UPLOAD_MAX_AGE_HOURS * 3600):
+    """Удаляет брошенные загрузки; возвращает (число загрузок, освобождено байт)"""
+    now = time.time()
+    removed = 0
+    reclaimed = 0
+
+    for name in os.listdir(PARTIAL_UPLOAD_FOLDER):
+        path = os.path.join(PARTIAL_UPLOAD_FOLDER, name)
+        upload_id = name[:-len('.json')] if name.endswith('.json') else name
+        if not UPLOAD_ID_PATTERN.match(upload_id):
+            continue
+        try:
+            if now - os.path.getmtime(path) < max_age_seconds:
+                continue
+        except FileNotFoundError:
+            continue
+
+        if name.endswith('.json'):
+            # Метаданные без файла данных
+            if not os.path.exists(os.path.join(PARTIAL_UPLOAD_FOLDER, upload_id)):
+                os.remove(path)
+            continue
+
+        with open(path, 'r+b') as f:
+            if not _try_lock(f):
+                continue
+            size = os.fstat(f.fileno()).st_size
+            os.remove(path)
+            meta_path = _meta_path(upload_id)
+            if os.path.exists(meta_path):
+                os.remove(meta_path)
+
+        _hashers.pop(upload_id, None)
+        removed += 1
+        reclaimed += size
+
+    return removed, reclaimed
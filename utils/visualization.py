@@ -132,4 +132,11 @@ def add_info_panel(image, detections, processing_time=None):
         cv2.putText(img, time_text, (width - 300, 35), 
                    font, 0.7, color, 1, cv2.LINE_AA)
     
-    return img
\ No newline at end of file
+    return img
+
+def render_result_image(image, detections, processing_time=None):
+    img = image
+    for detection in detections:
+        img = draw_colored_box(img, detection)
+
+    return add_info_panel(img, detections, processing_time)